@@ -1,18 +1,20 @@
 # app.py — 美化与功能增强版（长条 logo 放大版）
-import os
-import io
-import re
-import json
-import base64
-from pathlib import Path
-from typing import List, Tuple
-
-import pandas as pd
-import networkx as nx
+import hashlib
+
 import streamlit as st
 import streamlit.components.v1 as components
-from PIL import Image
-import qrcode
+
+from avatar_cache import AvatarCache, PLACEHOLDER
+from avatar_ingest import ingest_avatars
+from export_jobs import ExportJob, ExportJobs
+from live_preview import live_preview
+from profiling import PROFILER
+from genealogy import (
+    ANIMATION_MAX_NODES, AVATAR_DIR, AVATAR_THUMB_SIZES, CACHE_DIR, DATA_DIR, EXPORT_DIR, THEME, WULAO, WULAO_KEYWORDS,
+    DataPipeline, format_size, generate_qr_for_url, img_to_base64, paginate, pil_resize_and_save, search_persons,
+    SPRING_MAX_NODES, spring_backend,
+)
+from store import GenealogyStore
 
 # ---------------- basic config ----------------
 st.set_page_config(
@@ -21,273 +23,124 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-ROOT = Path.cwd()
-DATA_DIR = ROOT / "data"
-AVATAR_DIR = ROOT / "static" / "avatars"
-EXPORT_DIR = ROOT / "exports"
-DATA_DIR.mkdir(exist_ok=True)
-AVATAR_DIR.mkdir(parents=True, exist_ok=True)
-EXPORT_DIR.mkdir(parents=True, exist_ok=True)
-
-PLACEHOLDER = ("data:image/png;base64,"
-               "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR4nGNgYAAAAAMAASsJTYQAAAAASUVORK5CYII=")
-
-# 主题色：深红 + 更亮金色
-THEME = {
-    "accent": "#8B0000",   # 深红
-    "edge": "#8b4513",     # 棕边
-    "bg": "#8B0000",       # 页面纯红背景（默认）
-    "gold": "#FFD60A",     # 更亮的金色
-    "yellow": "#FFD800"    # 黄色（副标题）
+# 头像缩略图缓存的内存与磁盘预算
+AVATAR_CACHE_MAX_BYTES = 64 * 1024 * 1024
+AVATAR_CACHE_DISK_MAX_BYTES = 256 * 1024 * 1024
+# 流水线派生结果（渲染好的 HTML、实时预览条目、视图子图、布局、图集）的内存预算，由所有会话共用
+PIPELINE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# 图谱布局：physics 为浏览器端 barnesHut 物理模拟；spring / generation 在服务端预先计算坐标并关闭物理模拟
+LAYOUT_MODES = {
+    "浏览器物理模拟": "physics",
+    "力导向（服务端预计算）": "spring",
+    "按代际分层（服务端预计算）": "generation",
 }
 
-# 五老精神（带简短说明，用于左侧导出说明）
-WULAO = {
-    "忠诚": "对党和人民事业无限忠诚，矢志不渝",
-    "关爱": "关心下一代成长，无私奉献爱心",
-    "创新": "勇于探索，推动工作创新发展",
-    "奉献": "无私奉献，不计个人得失",
-    "务实": "脚踏实地，注重实际成效"
+# 图谱视图：全图 / 以某人为中心的 k 跳邻域 / 上下 N 代世系（均可再按关系类型过滤）
+VIEW_MODES = {
+    "全图": "all",
+    "人物邻域（k 跳）": "ego",
+    "上下 N 代世系": "lineage",
 }
-WULAO_KEYWORDS = list(WULAO.keys())
-
-# ---------------- helpers ----------------
-def safe_read_csv(path: Path) -> pd.DataFrame:
-    if path.exists():
-        try:
-            return pd.read_csv(path, dtype=str, encoding="utf-8-sig").fillna("")
-        except Exception:
-            return pd.DataFrame()
-    return pd.DataFrame()
-
-def img_to_base64(path: str) -> str:
-    """将图片文件转为 data:...;base64, 若失败返回占位图"""
-    if not path:
-        return PLACEHOLDER
-    p = Path(path)
-    if not p.exists():
-        return PLACEHOLDER
-    ext = p.suffix.lower()
-    mime = "image/png" if ext == ".png" else "image/jpeg"
-    try:
-        with open(p, "rb") as f:
-            b = base64.b64encode(f.read()).decode("utf-8")
-        return f"data:{mime};base64,{b}"
-    except Exception:
-        return PLACEHOLDER
-
-def pil_resize_and_save(file_bytes: bytes, out_path: Path, max_w=1600, max_h=1200, quality=85):
-    """调整并保存图片（用于上传背景 / 头像 / logo）"""
-    img = Image.open(io.BytesIO(file_bytes)).convert("RGB")
-    img.thumbnail((max_w, max_h), Image.LANCZOS)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out_path, format="JPEG", quality=quality, optimize=True)
-    return out_path
-
-def find_avatar_path(avatar_field: str) -> str:
-    """尝试从绝对路径、static/avatars、data/、ROOT 中寻找头像文件"""
-    if not avatar_field or not str(avatar_field).strip():
-        return ""
-    p = Path(str(avatar_field))
-    if p.is_absolute() and p.exists():
-        return str(p)
-    # try static avatars
-    cand1 = AVATAR_DIR / str(avatar_field)
-    if cand1.exists():
-        return str(cand1)
-    # try data/
-    cand2 = DATA_DIR / str(avatar_field)
-    if cand2.exists():
-        return str(cand2)
-    # try project root
-    cand3 = ROOT / str(avatar_field)
-    if cand3.exists():
-        return str(cand3)
-    return ""
-
-def parse_relations(rel_df: pd.DataFrame) -> List[Tuple[str,str,str]]:
-    triples = []
-    if rel_df.empty:
-        return triples
-    cols_lower = [c.lower() for c in rel_df.columns]
-    if "source" in cols_lower and "target" in cols_lower:
-        df = rel_df.copy()
-        df.columns = cols_lower
-        for _, r in df.iterrows():
-            s = str(r.get("source","")).strip()
-            t = str(r.get("target","")).strip()
-            rel = str(r.get("relation","")).strip() if "relation" in df.columns else ""
-            if s and t:
-                triples.append((s, rel or "关系", t))
-        return triples
-    if "描述" in rel_df.columns:
-        pat = re.compile(r"([\u4e00-\u9fa5A-Za-z0-9_\-\s]{1,60})是([\u4e00-\u9fa5A-Za-z0-9_\-\s]{0,60})的([\u4e00-\u9fa5A-Za-z0-9_\-\s]{1,60})")
-        for txt in rel_df['描述'].astype(str):
-            m = pat.match(txt)
-            if m:
-                s = m.group(1).strip()
-                o = m.group(2).strip()
-                r = m.group(3).strip()
-                if s and o:
-                    triples.append((s, r, o))
-    return triples
-
-def build_graph(triples: List[Tuple[str,str,str]]) -> nx.DiGraph:
-    G = nx.DiGraph()
-    for s, r, t in triples:
-        G.add_node(s)
-        G.add_node(t)
-        G.add_edge(s, t, label=r or "")
-    return G
-
-def generate_qr_for_url(url: str, out_path: Path):
-    img = qrcode.make(url)
-    img.save(out_path)
-    return out_path
-
-# ---------------- render vis html ----------------
-def render_vis_html(G: nx.Graph, persons_df: pd.DataFrame, accent: str, edge_color: str, bg_color: str) -> str:
-    nodes = []
-    edges = []
-    for n in G.nodes():
-        row = persons_df[persons_df['name'] == n] if not persons_df.empty else pd.DataFrame()
-        intro = row['intro'].iloc[0] if (not row.empty and 'intro' in row.columns) else ""
-        bio = row['bio'].iloc[0] if (not row.empty and 'bio' in row.columns) else ""
-        avatar_b64 = PLACEHOLDER
-
-        if not row.empty and 'avatar' in row.columns and row['avatar'].iloc[0]:
-            avatar_field = row['avatar'].iloc[0]
-            realp = find_avatar_path(avatar_field)
-            if realp:
-                avatar_b64 = img_to_base64(realp)
-
-        spirit_tags = []
-        if isinstance(bio, str):
-            for kw in WULAO_KEYWORDS:
-                if kw in bio:
-                    spirit_tags.append(kw)
-
-        node_color = None
-        if spirit_tags or (not row.empty and 'is_wulao' in row.columns and str(row['is_wulao'].iloc[0]).strip() == "1"):
-            node_color = {"border": THEME["gold"], "background": "#fff"}
-
-        nodes.append({
-            "id": n,
-            "label": n,
-            "image": avatar_b64,
-            "shape": "circularImage",
-            "title": f"<div style='max-width:260px;font-size:13px;'><b>{n}</b><br>{intro}</div>",
-            "bio": "; ".join(spirit_tags + ([bio] if bio else [])),
-            "color": node_color
-        })
-    for u, v, d in G.edges(data=True):
-        edges.append({"from": u, "to": v, "label": d.get("label",""), "arrows": "to"})
-    nodes_json = json.dumps(nodes, ensure_ascii=False)
-    edges_json = json.dumps(edges, ensure_ascii=False)
-
-    template = """
-<!doctype html>
-<html lang="zh-CN">
-<head>
-<meta charset="utf-8" />
-<meta name="viewport" content="width=device-width,initial-scale=1" />
-<title>五老精神 动态系谱图</title>
-<style>
-  html,body { height:100%; margin:0; background: __BG__; font-family: 'Noto Sans SC', 'Microsoft YaHei', Arial, sans-serif; color:#222; }
-  #mynetwork { width:100%; height:100%; border-radius:8px; box-shadow: 0 14px 40px rgba(0,0,0,0.12); overflow:hidden; }
-  .modal { position:fixed; right:18px; top:18px; width:360px; max-width:calc(100vw - 32px); background:#fff; padding:14px; border-radius:10px; box-shadow:0 12px 36px rgba(0,0,0,0.14); display:none; z-index:9999; border-left:4px solid __ACCENT__; }
-  .modal img { width:110px; height:110px; border-radius:50%; object-fit:cover; border:4px solid __ACCENT__; box-shadow:0 10px 30px rgba(0,0,0,0.12); }
-  .badge { display:inline-block; padding:4px 8px; margin:4px 4px 0 0; border-radius:10px; background:linear-gradient(90deg, __ACCENT__, __EDGE__); color:#fff; font-size:12px; }
-</style>
-<script src="https://unpkg.com/vis-network@9.1.2/dist/vis-network.min.js"></script>
-</head>
-<body>
-  <div id="mynetwork"></div>
-  <div class="modal" id="modalCard" aria-hidden="true">
-    <div style="text-align:center">
-      <img id="mAvatar" src="" alt="avatar"/>
-      <h3 id="mName" style="margin:12px 0 6px;color:__ACCENT__"></h3>
-    </div>
-    <div id="mBio" style="font-size:14px;color:#222;line-height:1.6;max-height:260px;overflow:auto;"></div>
-  </div>
-
-<script>
-  const nodesData = __NODES__;
-  const edgesData = __EDGES__;
-  const container = document.getElementById('mynetwork');
-  const nodes = new vis.DataSet(nodesData);
-  const edges = new vis.DataSet(edgesData);
-  const data = { nodes: nodes, edges: edges };
-  const options = {
-    nodes: {
-      shape: 'circularImage',
-      size: 48,
-      font: { size:14, color:'#222' },
-      borderWidth: 2,
-      color: { border: '__ACCENT__', background: '#fff' }
-    },
-    edges: {
-      color: { color: '__EDGE__' },
-      width: 2,
-      smooth: { enabled:true, type:'dynamic' },
-      font: { align: 'middle' }
-    },
-    interaction: { hover:true, navigationButtons:true, zoomView:true },
-    physics: { enabled:true, barnesHut: { gravitationalConstant: -20000, springLength: 180, springConstant: 0.01 }, stabilization: { iterations: 250 } }
-  };
-  const network = new vis.Network(container, data, options);
-
-  const modal = document.getElementById('modalCard');
-  const mAvatar = document.getElementById('mAvatar');
-  const mName = document.getElementById('mName');
-  const mBio = document.getElementById('mBio');
-
-  network.on('click', function(params) {
-    if (params.nodes.length > 0) {
-      const id = params.nodes[0];
-      const node = nodes.get(id);
-      mAvatar.src = node.image || '';
-      mName.innerText = node.label || id;
-      mBio.innerHTML = (node.bio && node.bio.length>0) ? node.bio.replace(/\\n/g, '<br/>').replace(/; /g, '<br/>') : '<i style="color:#888">暂无详细信息</i>';
-      modal.style.display = 'block';
-    } else {
-      modal.style.display = 'none';
-    }
-  });
-
-  window.addEventListener('click', function(e) {
-    if (!e.target.closest('.modal') && !e.target.closest('.vis-network')) {
-      modal.style.display = 'none';
-    }
-  });
-
-  network.once('stabilizationIterationsDone', function() {
-    try {
-      const ids = nodes.getIds();
-      let i = 0;
-      function step() {
-        if (i >= ids.length) return;
-        const nid = ids[i];
-        const old = nodes.get(nid);
-        nodes.update({ id: nid, size: (old.size || 48) * 1.18 });
-        setTimeout(()=> nodes.update({ id: nid, size: (old.size || 48) }), 650);
-        i++;
-        setTimeout(step, 90);
-      }
-      setTimeout(step, 200);
-    } catch(e){ console.warn(e); }
-  });
-</script>
-</body>
-</html>
-"""
-    html = template.replace("__NODES__", nodes_json).replace("__EDGES__", edges_json)
-    html = html.replace("__ACCENT__", accent).replace("__EDGE__", edge_color).replace("__BG__", bg_color)
-    return html
+
+# 数据源：csv 每次变化时整表重新解析；sqlite 把 CSV 增量同步进 data/genealogy.sqlite3，生平按需读取
+DATA_BACKENDS = {
+    "CSV 文件": "csv",
+    "SQLite 数据库（增量同步）": "sqlite",
+}
+STORE_PATH = DATA_DIR / "genealogy.sqlite3"
+
+# 人物名录每页人数可选项
+DIRECTORY_PAGE_SIZES = [12, 24, 48, 96]
+
+# 中心人物下拉框最多列出的匹配人数（只把检索结果发给浏览器，不下发全部姓名）
+CENTER_OPTION_LIMIT = 50
+
+# 导出模式：inline 为单文件（头像 base64 内联）；lazy 为占位小图内联 + 头像原图放在 zip 内 assets/ 下、点开详情时再加载
+EXPORT_MODES = {
+    "单文件 HTML（头像内联）": "inline",
+    "轻量包 ZIP（头像按需加载）": "lazy",
+}
+EXPORT_BUTTON_LABELS = {"inline": "生成单文件 HTML 并导出", "lazy": "生成轻量包 ZIP 并导出"}
 
 # ---------------- UI helpers & CSS ----------------
-def inject_app_css():
-    css = f"""
+def select_center(data: dict) -> str:
+    """检索框 + 只含匹配结果的下拉框选择中心人物；人物表之外、只出现在关系里的姓名按姓名匹配"""
+    graph_index = data["graph_index"]
+    query = st.sidebar.text_input("搜索中心人物（姓名 / 简介 / 精神标签）", key="center_query").strip()
+    names = [p["name"] for p in search_persons(data["person_index"], query) if p["name"] in graph_index.position]
+    if len(names) < CENTER_OPTION_LIMIT:
+        listed = set(names)
+        names += [n for n in graph_index.position
+                  if n not in data["person_index"] and n not in listed and query.lower() in n.lower()]
+    total = len(names)
+    names = names[:CENTER_OPTION_LIMIT]
+    previous = st.session_state.get("center_choice")
+    if previous in graph_index.position and previous not in names:
+        names.insert(0, previous)
+    if not names:
+        st.sidebar.caption("没有匹配的人物")
+        return ""
+    if total > CENTER_OPTION_LIMIT:
+        st.sidebar.caption(f"共 {total} 人匹配，仅列出前 {CENTER_OPTION_LIMIT} 人，请输入更多字缩小范围")
+    return st.sidebar.selectbox("中心人物", options=names, key="center_choice")
+
+@st.cache_resource
+def ensure_dirs():
+    """每个进程只建一次目录（写文件的地方另会按需建父目录）"""
+    DATA_DIR.mkdir(exist_ok=True)
+    AVATAR_DIR.mkdir(parents=True, exist_ok=True)
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+
+@st.cache_resource
+def get_avatar_cache() -> AvatarCache:
+    """进程级头像缩略图缓存（跨 rerun 复用）"""
+    return AvatarCache(CACHE_DIR / "thumbs", max_bytes=AVATAR_CACHE_MAX_BYTES, disk_max_bytes=AVATAR_CACHE_DISK_MAX_BYTES)
+
+@st.cache_resource
+def get_pipeline(backend: str = "csv") -> DataPipeline:
+    """进程级数据流水线（所有会话共用解析结果、图与渲染结果），每种数据源一个实例"""
+    store = GenealogyStore(STORE_PATH) if backend == "sqlite" else None
+    return DataPipeline(DATA_DIR, AVATAR_DIR, avatar_cache=get_avatar_cache(), cache_max_bytes=PIPELINE_CACHE_MAX_BYTES,
+                        cache_dir=CACHE_DIR, store=store)
+
+@st.cache_resource
+def get_export_jobs(backend: str = "csv") -> ExportJobs:
+    """进程级后台导出任务（结果缓存在 exports/jobs/<哈希>/，各会话共享）"""
+    return ExportJobs(get_pipeline(backend), EXPORT_DIR / "jobs")
+
+def export_job_panel(job: ExportJob, polling: bool):
+    """导出任务的进度 / 取消 / 下载区域；任务进行中时以 fragment 定时刷新，结束后整页重跑一次停止轮询"""
+    if not job.finished:
+        st.progress(job.progress, text=f"正在后台导出… {job.progress:.0%}")
+        if st.button("取消导出"):
+            job.cancel()
+        return
+    if polling:
+        st.rerun()
+    if job.status == "cancelled":
+        st.info("导出已取消")
+        return
+    if job.status == "failed":
+        st.error(f"导出失败：{job.error}")
+        return
+    result = job.result
+    out = result["path"]
+    source = "（参数未变，直接使用已有导出文件）" if job.cached else f"（用时 {job.seconds:.1f} 秒）"
+    if job.mode == "inline":
+        # 传入可调用对象：点击下载时才读取文件，不在每次 rerun 时把整份导出读进内存
+        st.download_button("⬇️ 下载 HTML 文件", data=out.read_bytes, file_name=out.name, mime="text/html")
+        st.success(f"已生成导出文件（已内联头像为 base64）{source}")
+    else:
+        st.download_button("⬇️ 下载 ZIP 包", data=out.read_bytes, file_name=out.name, mime="application/zip")
+        inline = f"（单文件模式为 {format_size(result['inline_html_bytes'])}）" if result.get("inline_html_bytes") else ""
+        st.success(f"已生成轻量包{source}：HTML {format_size(result['html_bytes'])}{inline}，"
+                   f"头像 {result['assets']} 张共 {format_size(result['assets_bytes'])}，ZIP {format_size(result['zip_bytes'])}")
+        st.caption("解压后打开 genealogy_export.html 即可；头像原图仅在点开人物详情时加载。")
+
+@st.cache_resource
+def app_css() -> str:
+    return f"""
     <style>
     /* 顶部横幅与卡片样式 (标题金色、放大、居中)，并留出 logo 区域 */
     .topbar {{
@@ -320,10 +173,102 @@ def inject_app_css():
     .small-muted {{ color:#666; font-size:12px; }}
     </style>
     """
-    st.markdown(css, unsafe_allow_html=True)
+
+def set_profiling():
+    PROFILER.enabled = st.session_state["profiling"]
+
+def diagnostics_panel():
+    """侧栏性能诊断：各阶段耗时与载荷体积（进程级累计，含导出线程），可下载 JSON / Prometheus 文本"""
+    if not PROFILER.enabled:
+        return
+    snap = PROFILER.snapshot()
+    with st.sidebar.expander("性能诊断", expanded=True):
+        if not snap["stages"] and not snap["sizes"]:
+            st.caption("尚无记录，刷新页面或切换视图后再看")
+            return
+        st.caption("各阶段耗时（ms，进程级累计）")
+        st.dataframe([{"阶段": k, "次数": v["count"], "合计": round(v["total_ms"], 1), "平均": round(v["mean_ms"], 2),
+                       "最大": round(v["max_ms"], 1), "最近": round(v["last_ms"], 1)} for k, v in snap["stages"].items()],
+                     hide_index=True)
+        if snap["sizes"]:
+            st.caption("载荷体积")
+            st.dataframe([{"载荷": k, "次数": v["count"], "最近": format_size(v["last_bytes"]), "最大": format_size(v["max_bytes"])}
+                          for k, v in snap["sizes"].items()], hide_index=True)
+        c1, c2 = st.columns(2)
+        c1.download_button("JSON", data=PROFILER.to_json(), file_name="genealogy_profile.json", mime="application/json")
+        c2.download_button("Prometheus", data=PROFILER.to_prometheus(), file_name="genealogy_metrics.prom", mime="text/plain")
+        if st.button("清零统计"):
+            PROFILER.reset()
+            st.rerun()
+
+def render_directory(pipeline: DataPipeline, data: dict, avatar_cache: AvatarCache):
+    """人物名录（不显示时间）：服务端检索 + 分页，只为当前页生成缩略图"""
+    person_index = data["person_index"]
+    st.markdown("## 人物名录（从 data/persons.csv 读取头像）")
+    f1, f2, f3, f4 = st.columns([3, 3, 1, 1])
+    query = f1.text_input("搜索姓名 / 简介 / 精神标签", value="", key="dir_query")
+    spirit_counts = data["spirit_counts"]
+    spirits = f2.multiselect("按五老精神筛选", options=WULAO_KEYWORDS, key="dir_spirits",
+                             format_func=lambda s: f"{s}（{spirit_counts.get(s, 0)} 人）")
+    wulao_only = f3.checkbox("仅五老人物", value=False, key="dir_wulao_only")
+    per_page = f4.selectbox("每页", options=DIRECTORY_PAGE_SIZES, index=1, key="dir_per_page")
+    matched = search_persons(person_index, query, spirits, wulao_only)
+    page_count = max(1, (len(matched) + per_page - 1) // per_page)
+    # 页码控件的 key 随筛选条件变化，条件一变就回到第 1 页
+    page_key = "dir_page_" + hashlib.sha1(repr((query, spirits, wulao_only, per_page)).encode("utf-8")).hexdigest()[:12]
+    page = st.number_input(f"页码（共 {page_count} 页，{len(matched)} 人）", min_value=1, max_value=page_count, value=1, key=page_key)
+    page_items, _ = paginate(matched, page, per_page)
+
+    per_row = 4
+    cols = st.columns(per_row)
+    page_bytes = 0
+    for i, p in enumerate(page_items):
+        col = cols[i % per_row]
+        avatar_path = p["avatar_path"]
+        avatar_uri = avatar_cache.data_uri(avatar_path, AVATAR_THUMB_SIZES["directory"]) if avatar_path else PLACEHOLDER
+        border = THEME['gold'] if p["highlight"] else "#ddd"
+
+        card_html = f"""
+        <div class="card" style="text-align:center;border:2px solid {border};">
+          <img src="{avatar_uri}" class="avatar-img" style="border-color:{border};"/>
+          <div style="margin-top:8px;font-weight:700;color:{THEME['accent']};">{p['name']}</div>
+          <div class="small-muted" style="margin-top:6px;color:#666;">{p['intro']}</div>
+        </div>
+        """
+        if PROFILER.enabled:
+            page_bytes += len(card_html.encode("utf-8"))
+        col.markdown(card_html, unsafe_allow_html=True)
+        # on_change="rerun" 让展开状态可读，详情（含大图）只在展开时才生成
+        with col.expander("查看详情", key=f"detail_{p['name']}", on_change="rerun") as detail:
+            if detail.open:
+                st.markdown(f"### {p['name']}")
+                if avatar_path:
+                    st.image(avatar_cache.data_uri(avatar_path, AVATAR_THUMB_SIZES["detail"]), width=220)
+                st.markdown(f"**简介**: {p['intro']}")
+                st.markdown(f"**生平/事迹**: {pipeline.bio(data, p['name'])}")
+                st.markdown("---")
+    PROFILER.size("directory_page", page_bytes)
+
+def inject_app_css():
+    # Streamlit 每次 rerun 都要重新输出该元素样式才保留；内容不变时前端不重绘，这里只省去每次拼接
+    st.markdown(app_css(), unsafe_allow_html=True)
+
+def render_header(logo_uri: str):
+    """顶部横幅（左侧 logo，标题居中）。在读取数据之前输出，首屏不必等 pandas 导入与 CSV 解析"""
+    logo_img_html = f'<img src="{logo_uri}" alt="logo">' if logo_uri else ""
+    st.markdown(f"""
+    <div class="topbar" style="position:relative; z-index:100;">
+      <div class="logo-area">{logo_img_html}</div>
+      <div>
+        <div class="title">数绘师道 · 五老精神 系谱平台</div>
+        <div class="subtitle">传承红色基因 · 忠诚 · 关爱 · 创新 · 奉献 · 务实</div>
+      </div>
+    </div>
+    """, unsafe_allow_html=True)
 
 # ---------------- main app ----------------
 def main():
+    ensure_dirs()
     inject_app_css()
 
     # header (centered gold title with logo area on left)
@@ -352,6 +297,7 @@ def main():
             st.sidebar.success("已上传并保存到 data/logo_uploaded.jpg")
     if logo_uri:
         st.sidebar.image(logo_uri, width=220, caption="Logo 预览")
+    render_header(logo_uri)
 
     # Background chooser (from data folder or upload)
     st.sidebar.subheader("页面背景（可选）")
@@ -372,41 +318,60 @@ def main():
             bg_data_uri = img_to_base64(str(saved))
             st.sidebar.success("已上传并保存到 data/custom_bg.jpg")
 
+    # graph layout
+    st.sidebar.subheader("图谱布局")
+    layout_label = st.sidebar.radio("布局方式（节点较多时建议服务端预计算）", list(LAYOUT_MODES.keys()), index=0,
+                                    help=f"力导向布局超过 {SPRING_MAX_NODES} 人时改用按代际分层布局")
+    layout_mode = LAYOUT_MODES[layout_label]
+    animate_max_nodes = st.sidebar.number_input("入场动画节点上限（超过则跳过动画）", min_value=0, value=ANIMATION_MAX_NODES, step=50)
+    use_atlas = st.sidebar.checkbox("头像打包为图集（减少图片数量与解码开销）", value=False)
+    live_mode = st.sidebar.checkbox("增量刷新预览（保留节点位置与缩放）", value=True)
+
     # avatar batch upload
     st.sidebar.subheader("头像批量上传（保存到 static/avatars/）")
     up_avatars = st.sidebar.file_uploader("选择头像（可多选）", accept_multiple_files=True, type=["jpg","jpeg","png"], key="avatars_uploader")
-    if up_avatars:
-        saved = []
-        for f in up_avatars:
-            name = Path(f.name).name
-            out = AVATAR_DIR / name
-            try:
-                pil_resize_and_save(f.read(), out, max_w=1200, max_h=1200, quality=85)
-            except Exception:
-                with open(out, "wb") as wf:
-                    wf.write(f.read())
-            saved.append(name)
-        st.sidebar.success(f"已保存 {len(saved)} 个头像到 static/avatars/（刷新页面生效）")
-        st.experimental_rerun()
+    # 同一批上传在后续 rerun 中仍留在上传框里，按 file_id 记录已处理的批次，避免重复导入
+    batch_key = tuple(f.file_id for f in up_avatars) if up_avatars else ()
+    if up_avatars and st.session_state.get("ingested_avatar_batch") != batch_key:
+        bar = st.sidebar.progress(0.0, text="正在处理头像…")
+        thumb_sizes = (AVATAR_THUMB_SIZES["graph"], AVATAR_THUMB_SIZES["directory"], AVATAR_THUMB_SIZES["graph"] * 2)
+        results = ingest_avatars(
+            ((f.name, f.getvalue()) for f in up_avatars), AVATAR_DIR, max_side=1200, quality=85,
+            thumb_dir=CACHE_DIR / "thumbs", thumb_sizes=thumb_sizes,
+            progress=lambda done, total, name: bar.progress(done / total, text=f"已处理 {done}/{total}：{name}"))
+        st.session_state["ingested_avatar_batch"] = batch_key
+        bar.empty()
+        failed = [(n, err) for n, err in results if err]
+        if len(results) > len(failed):
+            st.sidebar.success(f"已保存 {len(results) - len(failed)} 个头像到 static/avatars/")
+        for n, err in failed:
+            st.sidebar.warning(f"{n}：{err}")
 
     st.sidebar.markdown("---")
     st.sidebar.markdown("说明：请在 data/persons.csv 的 avatar 列填写头像文件名（相对 static/avatars/）或填写头像绝对路径。")
 
-    # load data
-    persons = safe_read_csv(DATA_DIR / "persons.csv")
-    relations = safe_read_csv(DATA_DIR / "relations.csv")
-
-    # render header with logo left and title centered
-    logo_img_html = f'<img src="{logo_uri}" alt="logo">' if logo_uri else ""
-    st.markdown(f"""
-    <div class="topbar" style="position:relative; z-index:100;">
-      <div class="logo-area">{logo_img_html}</div>
-      <div>
-        <div class="title">数绘师道 · 五老精神 系谱平台</div>
-        <div class="subtitle">传承红色基因 · 忠诚 · 关爱 · 创新 · 奉献 · 务实</div>
-      </div>
-    </div>
-    """, unsafe_allow_html=True)
+    # data backend
+    st.sidebar.subheader("数据源")
+    backend = DATA_BACKENDS[st.sidebar.radio("读取方式（人物较多时建议 SQLite）", list(DATA_BACKENDS.keys()), index=0)]
+    # 进程级开关：开启后所有会话与导出线程都记录，诊断面板显示在侧栏底部
+    st.sidebar.checkbox("性能诊断（记录各阶段耗时与载荷体积）", value=PROFILER.enabled, key="profiling", on_change=set_profiling)
+
+    # load data (fingerprint-cached)
+    pipeline = get_pipeline(backend)
+    data = pipeline.load()
+    if pipeline.store is not None and st.sidebar.button("从数据库导出 CSV（供编辑）"):
+        pipeline.store.export_csv(EXPORT_DIR / "persons.csv", EXPORT_DIR / "relations.csv")
+        st.sidebar.success("已导出到 exports/persons.csv 与 exports/relations.csv，编辑后覆盖 data/ 下同名文件即可增量同步")
+    persons = data["persons"]
+    relations = data["relations"]
+    cache_slot = st.sidebar.empty()
+
+    def show_cache_stats():
+        s = pipeline.stats()
+        render = f"最近渲染 {s['last_render_ms']:.0f} ms · " if s["last_render_ms"] else ""
+        cache_slot.caption(f"数据缓存：命中 {s['hits']} · 未命中 {s['misses']} · 最近重建 {s['last_rebuild_ms']:.0f} ms · {render}"
+                           f"共享 {s['cache_entries']} 项 {format_size(s['cache_bytes'])} / {format_size(s['cache_max_bytes'])}")
+    show_cache_stats()
 
     if persons.empty or relations.empty:
         st.warning("请确保 data/persons.csv 与 data/relations.csv 已准备好（头像放在 static/avatars/ 或使用绝对路径）。")
@@ -414,12 +379,40 @@ def main():
             st.markdown(f"<div style='height:160px;background-image:url({bg_data_uri});background-size:cover;border-radius:8px;'></div>", unsafe_allow_html=True)
         return
 
-    triples = parse_relations(relations)
+    triples = data["triples"]
     if not triples:
         st.error("未解析到任何关系，请检查 relations.csv（支持 source,target,relation 或 描述 列）")
         return
-
-    G = build_graph(triples)
+    rel_report = data["relation_report"]
+    if rel_report["skipped"]:
+        st.warning(f"relations.csv 共 {rel_report['total']} 行，其中 {rel_report['skipped']} 行未能解析，已跳过。")
+        with st.expander("查看未解析的样例行"):
+            for line_no, txt in rel_report["samples"]:
+                st.text(f"第 {line_no} 行：{txt}")
+
+    # graph view: 只把选中的子图交给渲染与导出
+    graph_index = data["graph_index"]
+    st.sidebar.subheader("图谱视图")
+    view_label = st.sidebar.radio("显示范围", list(VIEW_MODES.keys()), index=0)
+    view_mode = VIEW_MODES[view_label]
+    center, k, up, down = "", 1, 1, 1
+    if view_mode != "all":
+        center = select_center(data)
+        if view_mode == "ego":
+            k = st.sidebar.number_input("邻域跳数 k", min_value=1, max_value=10, value=2)
+        else:
+            up = st.sidebar.number_input("向上代数", min_value=0, max_value=20, value=2)
+            down = st.sidebar.number_input("向下代数", min_value=0, max_value=20, value=2)
+    rel_choice = st.sidebar.selectbox("关系类型", options=["（全部）"] + graph_index.relations, index=0)
+    relation = None if rel_choice == "（全部）" else rel_choice
+    view = pipeline.view(data, view_mode, center=center, k=k, up=up, down=down, relation=relation)
+    st.sidebar.caption(f"当前视图：{view['graph'].number_of_nodes()} 人 · {view['graph'].number_of_edges()} 条关系")
+    spring = spring_backend(view["graph"].number_of_nodes()) if layout_mode == "spring" else ""
+    if spring == "numpy":
+        st.sidebar.caption("未安装 scipy：力导向布局改用内置 numpy 实现（效果近似，迭代次数按规模截断，结果会缓存）")
+    elif spring == "generation":
+        st.sidebar.caption(f"当前视图超过 {SPRING_MAX_NODES} 人：力导向布局计算量过大，已改用按代际分层布局")
+    avatar_cache = get_avatar_cache()
 
     # Export & Wulao intro side-by-side
     left_col, right_col = st.columns([2,1])
@@ -427,21 +420,25 @@ def main():
         st.markdown("### 五老精神 — 诠释与宣言")
         cards_html = "<div style='display:flex;flex-wrap:wrap;gap:8px;'>"
         for k, v in WULAO.items():
-            cards_html += f"<div style='background:{THEME['gold']};color:{THEME['accent']};padding:10px;border-radius:8px;min-width:140px;box-shadow:0 6px 18px rgba(0,0,0,0.08);'><strong>{k}</strong><div style='font-size:13px;color:#4b2b2b;margin-top:6px'>{v}</div></div>"
+            cards_html += f"<div style='background:{THEME['gold']};color:{THEME['accent']};padding:10px;border-radius:8px;min-width:140px;box-shadow:0 6px 18px rgba(0,0,0,0.08);'><strong>{k}</strong> <span style='font-size:12px;'>{data['spirit_counts'].get(k, 0)} 人</span><div style='font-size:13px;color:#4b2b2b;margin-top:6px'>{v}</div></div>"
         cards_html += "</div>"
         st.markdown(cards_html, unsafe_allow_html=True)
         st.markdown("---")
-        st.markdown("**说明**：导出 HTML 会把头像以 Base64 内联，方便放到静态托管或通过二维码分享。")
+        st.markdown("**说明**：单文件模式会把头像以 Base64 内联，方便放到静态托管或通过二维码分享；人物较多时建议选择轻量包 ZIP，页面只内联占位小图，头像按需加载。")
     with right_col:
         st.markdown("### 导出与分享")
-        if st.button("生成单文件 HTML 并导出"):
+        export_label = st.radio("导出模式", list(EXPORT_MODES.keys()), index=0)
+        export_mode = EXPORT_MODES[export_label]
+        export_jobs = get_export_jobs(backend)
+        if st.button(EXPORT_BUTTON_LABELS[export_mode]):
             bg_style_value = f"url('{bg_data_uri}')" if bg_data_uri else THEME["bg"]
-            html = render_vis_html(G, persons, accent=THEME["gold"], edge_color=THEME["edge"], bg_color=bg_style_value)
-            out = EXPORT_DIR / "genealogy_export.html"
-            out.write_text(html, encoding="utf-8")
-            with open(out, "rb") as fh:
-                st.download_button("⬇️ 下载 HTML 文件", data=fh, file_name=out.name, mime="text/html")
-            st.success("已生成导出文件（已内联头像为 base64）")
+            job = export_jobs.submit(view, mode=export_mode, bg_color=bg_style_value,
+                                     layout=layout_mode, animate_max_nodes=animate_max_nodes, use_atlas=use_atlas)
+            st.session_state["export_job"] = job.id
+        job = export_jobs.get(st.session_state.get("export_job", ""))
+        if job is not None:
+            polling = not job.finished
+            st.fragment(export_job_panel, run_every=1.0 if polling else None)(job, polling)
 
         st.markdown("生成二维码以便分享（输入外部 URL）")
         user_url = st.text_input("外部 URL（可选）", value="")
@@ -459,48 +456,24 @@ def main():
 
     # render graph preview
     bg_style_value = f"url('{bg_data_uri}')" if bg_data_uri else THEME["bg"]
-    html = render_vis_html(G, persons, accent=THEME["gold"], edge_color=THEME["edge"], bg_color=bg_style_value)
-
     st.markdown("## 互动图谱（预览）")
-    components.html(html, height=720, scrolling=True)
-
-    # person directory (no time shown)
-    st.markdown("## 人物名录（从 data/persons.csv 读取头像）")
-    per_row = 4
-    cols = st.columns(per_row)
-    for i, r in persons.iterrows():
-        col = cols[i % per_row]
-        avatar_field = r.get("avatar", "")
-        avatar_path = find_avatar_path(avatar_field) if avatar_field else ""
-        avatar_uri = img_to_base64(avatar_path) if avatar_path else PLACEHOLDER
-
-        highlight = False
-        bio = r.get('bio','') or ""
-        for kw in WULAO_KEYWORDS:
-            if kw in str(bio):
-                highlight = True
-                break
-        if 'is_wulao' in r.index and str(r.get('is_wulao','')).strip() == "1":
-            highlight = True
-        border = THEME['gold'] if highlight else "#ddd"
-
-        card_html = f"""
-        <div class="card" style="text-align:center;border:2px solid {border};">
-          <img src="{avatar_uri}" class="avatar-img" style="border-color:{border};"/>
-          <div style="margin-top:8px;font-weight:700;color:{THEME['accent']};">{r.get('name','')}</div>
-          <div class="small-muted" style="margin-top:6px;color:#666;">{r.get('intro','')}</div>
-        </div>
-        """
-        col.markdown(card_html, unsafe_allow_html=True)
-        with col.expander("查看详情"):
-            st.markdown(f"### {r.get('name','')}")
-            if avatar_path:
-                st.image(avatar_path, width=220)
-            st.markdown(f"**简介**: {r.get('intro','')}")
-            st.markdown(f"**生平/事迹**: {r.get('bio','')}")
-            st.markdown("---")
-
-    st.caption("提示：导出的单文件 HTML 已将头像以 base64 内联，便于离线分享或放入二维码页面。若头像较多，导出文件会很大，建议压缩头像后再上传或只上传必要头像。")
+    if live_mode:
+        # 常驻组件：只下发与上次相比新增 / 变化 / 删除的节点与边，不重建网络
+        sync = live_preview(pipeline, view, accent=THEME["gold"], edge_color=THEME["edge"], bg_color=bg_style_value,
+                            layout=layout_mode, animate_max_nodes=animate_max_nodes, use_atlas=use_atlas)
+        if sync and not sync["reset"]:
+            st.caption(f"增量刷新：新增 {sync['added']} · 更新 {sync['updated']} · 删除 {sync['removed']}")
+    else:
+        html = pipeline.render(view, accent=THEME["gold"], edge_color=THEME["edge"], bg_color=bg_style_value,
+                               layout=layout_mode, animate_max_nodes=animate_max_nodes, use_atlas=use_atlas)
+        components.html(html, height=720, scrolling=True)
+    show_cache_stats()
+
+    with PROFILER.stage("directory"):
+        render_directory(pipeline, data, avatar_cache)
+
+    st.caption("提示：导出的单文件 HTML 已将头像以 base64 内联，便于离线分享或放入二维码页面。若头像较多，导出文件会很大，建议改用“轻量包 ZIP”导出模式，或压缩头像后再上传。")
 
 if __name__ == "__main__":
     main()
+    diagnostics_panel()
@@ -0,0 +1,288 @@
+# avatar_cache.py — 头像缩略图缓存（按文件内容哈希 + 目标尺寸寻址，内存 LRU + 磁盘持久化）
+import base64
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Pillow 只在真正缩放 / 拼图时导入：缩略图命中磁盘缓存的启动路径用不到它
+PLACEHOLDER = ("data:image/png;base64,"
+               "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR4nGNgYAAAAAMAASsJTYQAAAAASUVORK5CYII=")
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def resize_to_jpeg(file_bytes: bytes, max_w: int, max_h: int, quality: int = 85) -> bytes:
+    """把图片缩放到 max_w x max_h 以内并编码为 JPEG 字节。
+    JPEG 先用 draft() 让解码器直接按 1/2、1/4、1/8 缩小解码，大图省去大部分解码开销。"""
+    from PIL import Image
+    img = Image.open(io.BytesIO(file_bytes))
+    img.draft("RGB", (max_w, max_h))
+    img = img.convert("RGB")
+    img.thumbnail((max_w, max_h), Image.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality, optimize=True)
+    return buf.getvalue()
+
+
+def make_thumbnail(file_bytes: bytes, size: int, quality: int = 82) -> bytes:
+    """把原图缩放到 size x size 以内并编码为 JPEG 字节"""
+    return resize_to_jpeg(file_bytes, size, size, quality)
+
+
+@contextmanager
+def atomic_open(path: Path) -> Iterator[BinaryIO]:
+    """以二进制写方式打开 path 的临时文件，正常退出时 os.replace 到 path，出错时删除临时文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            yield f
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def atomic_write(path: Path, data: bytes):
+    """先写临时文件再 os.replace，读方不会看到写了一半的文件"""
+    with atomic_open(path) as f:
+        f.write(data)
+
+
+def thumb_filename(digest: str, size: int) -> str:
+    """磁盘缓存中缩略图的文件名（源文件 sha1 + 尺寸）"""
+    return f"{digest}_{size}.jpg"
+
+
+class AvatarCache:
+    """头像缩略图缓存。
+
+    - 键为 (文件内容 sha1, 目标尺寸)，同一张图被多个人物引用时只编码一次；
+    - 内存中保存已编码好的 data URI，按 max_bytes 做 LRU 淘汰；
+    - 缩略图 JPEG 落盘到 cache_dir，进程重启后无需重新缩放，磁盘按 disk_max_bytes 淘汰最久未用的文件；
+      磁盘占用在内存中按 文件名 -> 大小 记账（启动时扫描一次目录），超出预算时才在锁外重新扫描目录并淘汰；
+    - 源文件 mtime / 大小变化时重新计算哈希，旧条目自然失效。
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 64 << 20, disk_max_bytes: int = 256 << 20, quality: int = 82):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.quality = quality
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[str, str]" = OrderedDict()
+        self._mem_bytes = 0
+        # 源文件路径 -> (mtime_ns, size, sha1)，用于跳过未变化文件的哈希计算
+        self._digests: Dict[str, Tuple[int, int, str]] = {}
+        # 磁盘缓存记账：文件名 -> 字节数；其他进程（如 avatar_ingest）写入的文件在命中或下次扫描时补记
+        self._disk_sizes: Dict[str, int] = {}
+        self._disk_bytes = 0
+        self._prune_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        for name, size, _ in self._scan_disk():
+            self._disk_sizes[name] = size
+            self._disk_bytes += size
+
+    # ---- keys ----
+    def _digest_for(self, path: Path) -> Optional[str]:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        key = str(path)
+        known = self._digests.get(key)
+        if known and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+            return known[2]
+        digest = file_digest(path)
+        self._digests[key] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    # ---- memory LRU ----
+    def _mem_get(self, key: str) -> Optional[str]:
+        uri = self._mem.get(key)
+        if uri is not None:
+            self._mem.move_to_end(key)
+        return uri
+
+    def _mem_put(self, key: str, uri: str):
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_bytes -= len(old)
+        self._mem[key] = uri
+        self._mem_bytes += len(uri)
+        while self._mem_bytes > self.max_bytes and len(self._mem) > 1:
+            _, evicted = self._mem.popitem(last=False)
+            self._mem_bytes -= len(evicted)
+
+    # ---- disk store ----
+    def _disk_path(self, digest: str, size: int) -> Path:
+        return self.cache_dir / thumb_filename(digest, size)
+
+    def _disk_record(self, name: str, nbytes: int):
+        """记一笔磁盘占用（调用方持有 self._lock）"""
+        self._disk_bytes += nbytes - self._disk_sizes.get(name, 0)
+        self._disk_sizes[name] = nbytes
+
+    def _disk_put(self, digest: str, size: int, data: bytes):
+        path = self._disk_path(digest, size)
+        atomic_write(path, data)
+        with self._lock:
+            self._disk_record(path.name, len(data))
+            over = self._disk_bytes > self.disk_max_bytes
+        if over:
+            self._prune_disk()
+
+    def _scan_disk(self) -> List[Tuple[str, int, float]]:
+        """[(文件名, 字节数, mtime)]；扫描期间被其他进程删掉的文件直接跳过"""
+        files = []
+        for p in self.cache_dir.glob("*.jpg"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            files.append((p.name, st.st_size, st.st_mtime))
+        return files
+
+    def _prune_disk(self):
+        """按目录实际内容重新记账，并删除最久未用的文件直到不超过预算。不持有 self._lock；
+        同一时刻只有一个线程在淘汰，其余线程直接返回"""
+        if not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            files = self._scan_disk()
+            total = sum(size for _, size, _ in files)
+            removed = []
+            for name, size, _ in sorted(files, key=lambda f: f[2]):
+                if total <= self.disk_max_bytes:
+                    break
+                try:
+                    (self.cache_dir / name).unlink()
+                except OSError:
+                    continue
+                total -= size
+                removed.append(name)
+            gone = set(removed)
+            with self._lock:
+                self._disk_sizes = {name: size for name, size, _ in files if name not in gone}
+                self._disk_bytes = total
+        finally:
+            self._prune_lock.release()
+
+    # ---- public API ----
+    def thumbnail_bytes(self, path: str, size: int) -> Optional[bytes]:
+        """返回缩略图 JPEG 字节（优先读磁盘缓存）；源文件不可用时返回 None"""
+        if not path:
+            return None
+        p = Path(path)
+        with self._lock:
+            digest = self._digest_for(p)
+        if digest is None:
+            return None
+        disk = self._disk_path(digest, size)
+        if disk.exists():
+            try:
+                data = disk.read_bytes()
+                os.utime(disk)
+            except OSError:
+                pass
+            else:
+                with self._lock:
+                    if disk.name not in self._disk_sizes:
+                        self._disk_record(disk.name, len(data))
+                return data
+        try:
+            data = make_thumbnail(p.read_bytes(), size, self.quality)
+        except Exception:
+            return None
+        try:
+            self._disk_put(digest, size, data)
+        except OSError:
+            pass
+        return data
+
+    def data_uri(self, path: str, size: int) -> str:
+        """返回 size 尺寸缩略图的 data URI，失败时返回占位图"""
+        if not path:
+            return PLACEHOLDER
+        p = Path(path)
+        with self._lock:
+            digest = self._digest_for(p)
+            if digest is None:
+                return PLACEHOLDER
+            key = f"{digest}_{size}"
+            uri = self._mem_get(key)
+            if uri is not None:
+                self.hits += 1
+                return uri
+            self.misses += 1
+        data = self.thumbnail_bytes(path, size)
+        if data is None:
+            return PLACEHOLDER
+        uri = "data:image/jpeg;base64," + base64.b64encode(data).decode("ascii")
+        with self._lock:
+            self._mem_put(key, uri)
+        return uri
+
+    def pack_atlas(self, paths: Iterable[str], cell: int = 96, max_side: int = 4096, quality: int = 80) -> dict:
+        """把多张头像缩放为 cell x cell 的方形缩略图并拼成一张或几张图集（优先 WebP，不支持时用 JPEG）。
+        同内容的头像只占一个格子。返回 {"images": [data URI...], "cell": cell, "slots": {路径: (图集序号, x, y)}}"""
+        by_digest: Dict[str, List[str]] = {}
+        for path in paths:
+            if not path:
+                continue
+            with self._lock:
+                digest = self._digest_for(Path(path))
+            if digest is not None:
+                by_digest.setdefault(digest, []).append(path)
+
+        from PIL import Image, ImageOps, features
+        fmt, mime = ("WEBP", "image/webp") if features.check("webp") else ("JPEG", "image/jpeg")
+        per_row = max(1, max_side // cell)
+        per_sheet = per_row * per_row
+        digests = sorted(by_digest)
+        images: List[str] = []
+        slots: Dict[str, Tuple[int, int, int]] = {}
+        for start in range(0, len(digests), per_sheet):
+            chunk = digests[start:start + per_sheet]
+            cols = min(per_row, len(chunk))
+            rows = (len(chunk) + cols - 1) // cols
+            sheet = Image.new("RGB", (cols * cell, rows * cell), "white")
+            sheet_no = len(images)
+            for j, digest in enumerate(chunk):
+                members = by_digest[digest]
+                # 先取 2 倍尺寸的缓存缩略图，再居中裁成正方形，避免短边被放大
+                data = self.thumbnail_bytes(members[0], cell * 2)
+                if data is None:
+                    continue
+                tile = ImageOps.fit(Image.open(io.BytesIO(data)).convert("RGB"), (cell, cell), Image.LANCZOS)
+                x, y = (j % cols) * cell, (j // cols) * cell
+                sheet.paste(tile, (x, y))
+                for p in members:
+                    slots[p] = (sheet_no, x, y)
+            buf = io.BytesIO()
+            sheet.save(buf, format=fmt, quality=quality)
+            images.append(f"data:{mime};base64," + base64.b64encode(buf.getvalue()).decode("ascii"))
+        return {"images": images, "cell": cell, "slots": slots}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._mem), "bytes": self._mem_bytes, "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self._mem_bytes = 0
+            self._digests.clear()
@@ -0,0 +1,68 @@
+# avatar_ingest.py — 头像批量导入（进程池并行解码 / 缩放，原子写入，并预生成缩略图缓存）
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+from avatar_cache import atomic_write, make_thumbnail, resize_to_jpeg, thumb_filename
+
+# 少于该数量时直接在当前进程处理，省去进程池启动开销
+PARALLEL_MIN_FILES = 4
+
+
+def ingest_one(name: str, file_bytes: bytes, out_dir: str, max_side: int = 1200, quality: int = 85,
+               thumb_dir: Optional[str] = None, thumb_sizes: Sequence[int] = ()) -> Tuple[str, str]:
+    """缩放并保存一张头像，返回 (文件名, 错误信息)；无法解码时按原样保存。
+    thumb_dir 给出时，按 AvatarCache 的命名规则预生成 thumb_sizes 中各尺寸的缩略图。"""
+    name = Path(name).name
+    out = Path(out_dir) / name
+    error = ""
+    try:
+        data = resize_to_jpeg(file_bytes, max_side, max_side, quality)
+    except Exception as e:
+        data = file_bytes
+        error = f"无法解码，已按原文件保存：{e}"
+    atomic_write(out, data)
+    if thumb_dir and not error:
+        digest = hashlib.sha1(data).hexdigest()
+        for size in thumb_sizes:
+            thumb = Path(thumb_dir) / thumb_filename(digest, size)
+            if not thumb.exists():
+                atomic_write(thumb, make_thumbnail(data, size))
+    return name, error
+
+
+def _ingest_job(job: tuple) -> Tuple[str, str]:
+    return ingest_one(*job)
+
+
+def ingest_avatars(files: Iterable[Tuple[str, bytes]], out_dir: Path, max_side: int = 1200, quality: int = 85,
+                   thumb_dir: Optional[Path] = None, thumb_sizes: Sequence[int] = (),
+                   max_workers: Optional[int] = None,
+                   progress: Optional[Callable[[int, int, str], None]] = None) -> List[Tuple[str, str]]:
+    """批量导入头像，返回 [(文件名, 错误信息), ...]（按完成顺序）。
+    progress(已完成数, 总数, 文件名) 在每张图片处理完后调用。"""
+    jobs = [(name, data, str(out_dir), max_side, quality, str(thumb_dir) if thumb_dir else None, tuple(thumb_sizes))
+            for name, data in files]
+    total = len(jobs)
+    results: List[Tuple[str, str]] = []
+    if total < PARALLEL_MIN_FILES:
+        for job in jobs:
+            results.append(_ingest_job(job))
+            if progress:
+                progress(len(results), total, results[-1][0])
+        return results
+    workers = max_workers or min(total, os.cpu_count() or 1)
+    # spawn：调用方（Streamlit 服务器）是多线程进程，fork 出的子进程可能继承其他线程持有的锁而卡死
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(_ingest_job, job): job[0] for job in jobs}
+        for fut in as_completed(futures):
+            try:
+                results.append(fut.result())
+            except Exception as e:
+                results.append((Path(futures[fut]).name, f"保存失败：{e}"))
+            if progress:
+                progress(len(results), total, results[-1][0])
+    return results
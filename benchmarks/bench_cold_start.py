@@ -0,0 +1,70 @@
+# benchmarks/bench_cold_start.py — 冷启动：各模块导入耗时、导入后已加载的重依赖、app.py 首屏前与首次完整运行的耗时
+# 每项都在新的 Python 进程中测量（取中位数）；--eager 在测量前先导入 pandas / networkx / Pillow / qrcode，模拟改为按需导入之前的启动路径。
+# 用法：python benchmarks/bench_cold_start.py [--repeat 5] [--eager] [--skip-app]
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY = ("pandas", "networkx", "PIL", "qrcode", "numpy")
+EAGER = "import pandas, networkx, qrcode; from PIL import Image, ImageOps, features\n"
+
+# 新进程里执行的测量代码：t0 取自解释器启动之后，不含解释器本身的启动时间
+IMPORT_PROBE = """
+import sys, time, json
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+{eager}{stmt}
+print(json.dumps({{"seconds": time.perf_counter() - t0, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+# 首屏前：app.py 在输出顶部横幅之前要完成的导入；首次运行：AppTest 冷进程跑一遍完整脚本（含读 CSV、建图、渲染）
+APP_FIRST_PAINT = ("import streamlit, streamlit.components.v1\n"
+                   "import avatar_cache, avatar_ingest, export_jobs, live_preview, genealogy, store")
+APP_FIRST_RUN = ("from streamlit.testing.v1 import AppTest\n"
+                 "at = AppTest.from_file({app!r}, default_timeout=120).run()\n"
+                 "assert not at.exception, at.exception")
+
+CASES = (
+    ("import genealogy", "import genealogy"),
+    ("import store", "import store"),
+    ("import avatar_cache", "import avatar_cache"),
+    ("import cli", "import cli"),
+    ("app before paint", APP_FIRST_PAINT),
+)
+
+
+def probe(stmt: str, eager: bool) -> dict:
+    code = IMPORT_PROBE.format(root=str(ROOT), eager=EAGER if eager else "", stmt=stmt, heavy=HEAVY)
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(stmt: str, repeat: int, eager: bool):
+    runs = [probe(stmt, eager) for _ in range(repeat)]
+    return statistics.median(r["seconds"] for r in runs), runs[-1]["loaded"]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--eager", action="store_true", help="先导入全部重依赖（对照组）")
+    ap.add_argument("--skip-app", action="store_true", help="不跑 AppTest 完整运行（较慢）")
+    args = ap.parse_args()
+
+    cases = list(CASES)
+    if not args.skip_app:
+        cases.append(("app first run", APP_FIRST_RUN.format(app=str(ROOT / "app.py"))))
+    print(f"{'eager' if args.eager else 'lazy'} 模式，每项 {args.repeat} 个新进程取中位数")
+    print(f"{'case':<20} {'ms':>8}  loaded")
+    for label, stmt in cases:
+        repeat = 1 if stmt.startswith("from streamlit.testing") else args.repeat
+        seconds, loaded = measure(stmt, repeat, args.eager)
+        print(f"{label:<20} {seconds * 1000:>8.0f}  {', '.join(loaded) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
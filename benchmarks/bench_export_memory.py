@@ -0,0 +1,76 @@
+# benchmarks/bench_export_memory.py — 单文件 HTML 导出的峰值内存：整份拼接后写盘 vs write_vis_html 流式写盘
+# 用法：python benchmarks/bench_export_memory.py [--persons 5000] [--avatars 300]
+import argparse
+import io
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import genealogy  # noqa: E402
+from avatar_cache import AvatarCache, atomic_write  # noqa: E402
+from bench_person_index import synthetic_persons, synthetic_triples  # noqa: E402
+
+
+def make_avatars(dir_: Path, count: int):
+    dir_.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        img = Image.new("RGB", (400, 400), ((i * 37) % 256, (i * 91) % 256, (i * 53) % 256))
+        img.save(dir_ / f"a{i}.jpg", quality=85)
+
+
+def measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, peak, elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--persons", type=int, default=5000)
+    ap.add_argument("--avatars", type=int, default=300, help="不同头像文件数（人物循环引用）")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        make_avatars(tmp / "avatars", args.avatars)
+        persons = synthetic_persons(args.persons)
+        persons["avatar"] = [f"a{i % args.avatars}.jpg" for i in range(args.persons)]
+        index = genealogy.build_person_index(persons, (tmp / "avatars",))
+        G = genealogy.build_graph(synthetic_triples(args.persons))
+        cache = AvatarCache(tmp / "thumbs")
+        kwargs = dict(accent="#FFD60A", edge_color="#8b4513", bg_color="#8B0000", avatar_cache=cache, animate=False)
+        # 预热缩略图缓存，只测量 HTML 生成与写盘本身
+        genealogy.render_vis_html(G, index, **kwargs)
+
+        def joined():
+            body = genealogy.render_vis_html(G, index, **kwargs).encode("utf-8")
+            atomic_write(tmp / "joined.html", body)
+            return len(body)
+
+        def streamed():
+            with open(tmp / "streamed.html", "wb") as fh:
+                return genealogy.write_vis_html(fh, G, index, **kwargs)
+
+        def streamed_bytesio():
+            buf = io.BytesIO()
+            return genealogy.write_vis_html(buf, G, index, **kwargs)
+
+        print(f"{args.persons} 人，{args.avatars} 张不同头像")
+        print(f"{'method':>16} {'html MB':>8} {'peak MB':>8} {'ms':>8}")
+        for label, fn in (("join + write", joined), ("stream to file", streamed), ("stream BytesIO", streamed_bytesio)):
+            size, peak, elapsed = measure(fn)
+            print(f"{label:>16} {size / 1e6:>8.1f} {peak / 1e6:>8.2f} {elapsed * 1000:>8.0f}")
+        assert (tmp / "joined.html").read_bytes() == (tmp / "streamed.html").read_bytes()
+
+
+if __name__ == "__main__":
+    main()
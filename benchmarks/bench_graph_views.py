@@ -0,0 +1,41 @@
+# benchmarks/bench_graph_views.py — GraphIndex 子图查询（邻域 / 世系 / 关系类型）的耗时基准
+# 用法：python benchmarks/bench_graph_views.py [--nodes 100000]
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import genealogy  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--nodes", type=int, default=100000)
+    args = ap.parse_args()
+
+    rels = ["学生", "同事", "传承人"]
+    triples = [(f"人物{i}", rels[i % len(rels)], f"人物{(i - 1) // 3}") for i in range(1, args.nodes)]
+    G = genealogy.build_graph(triples)
+    t0 = time.perf_counter()
+    gi = genealogy.GraphIndex(G)
+    print(f"index build: {(time.perf_counter() - t0) * 1000:.1f} ms for {G.number_of_nodes()} nodes")
+
+    center = f"人物{args.nodes // 10}"
+    queries = {
+        "ego k=2": lambda: gi.ego(center, 2),
+        "lineage up=3 down=3": lambda: gi.lineage(center, 3, 3),
+        "lineage 学生 only": lambda: gi.lineage(center, 3, 3, relation="学生"),
+    }
+    for name, q in queries.items():
+        t0 = time.perf_counter()
+        nodes = q()
+        t1 = time.perf_counter()
+        sub = gi.subgraph(nodes)
+        t2 = time.perf_counter()
+        print(f"{name:>22}: {len(nodes):>6} nodes  query {(t1 - t0) * 1000:7.2f} ms  subgraph {(t2 - t1) * 1000:7.2f} ms"
+              f"  ({sub.number_of_edges()} edges)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# benchmarks/bench_person_index.py — render_vis_html 人物索引查找的规模基准
+# 用法：python benchmarks/bench_person_index.py [--max 10000]
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import genealogy  # noqa: E402
+
+
+def synthetic_persons(n: int) -> pd.DataFrame:
+    kws = genealogy.WULAO_KEYWORDS
+    return pd.DataFrame({
+        "name": [f"人物{i}" for i in range(n)],
+        "avatar": [""] * n,
+        "intro": [f"第{i}号人物简介" for i in range(n)],
+        "bio": [f"人物{i}生平，践行{kws[i % len(kws)]}精神。" for i in range(n)],
+        "time": ["不详"] * n,
+    })
+
+
+def synthetic_triples(n: int):
+    return [(f"人物{i}", "同事", f"人物{(i - 1) // 2}") for i in range(1, n)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max", type=int, default=10000)
+    args = ap.parse_args()
+
+    sizes = [s for s in (1000, 2500, 5000, 10000, 20000) if s <= args.max]
+    print(f"{'persons':>8} {'index ms':>10} {'render ms':>10} {'us/node':>8}")
+    for n in sizes:
+        persons = synthetic_persons(n)
+        G = genealogy.build_graph(synthetic_triples(n))
+        t0 = time.perf_counter()
+        index = genealogy.build_person_index(persons)
+        t1 = time.perf_counter()
+        genealogy.render_vis_html(G, index, accent="#FFD60A", edge_color="#8b4513", bg_color="#8B0000")
+        t2 = time.perf_counter()
+        print(f"{n:>8} {(t1 - t0) * 1000:>10.1f} {(t2 - t1) * 1000:>10.1f} {(t2 - t1) * 1e6 / n:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/bench_spirit_tags.py — 精神标签识别：逐关键词 `kw in bio` 与 SpiritTagger 一次扫描的对比
+# 用法：python benchmarks/bench_spirit_tags.py [--max 20000]
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import genealogy  # noqa: E402
+
+FILLER = "同志长期扎根教育事业，培养了大批学生，退休后继续参与关工委工作，在社区开展宣讲活动。"
+
+
+def synthetic_bios(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    terms = list(genealogy.SPIRIT_TAGGER.terms)
+    return [FILLER * rng.randint(3, 12) + "".join(rng.sample(terms, rng.randint(0, 3))) for _ in range(n)]
+
+
+def overlap_probes(terms, keywords):
+    """关键词与其他词条首尾重叠、或作为其他词条前缀的短文本（如“首创新”），检验关键词不被同义词吞掉"""
+    probes = []
+    for t in terms:
+        for kw in keywords:
+            if t == kw:
+                continue
+            probes.extend(t + kw[k:] for k in range(1, len(kw)) if t.endswith(kw[:k]))
+            probes.extend(kw + t[k:] for k in range(1, len(t)) if kw.endswith(t[:k]))
+            probes.append(kw + t)
+    return probes
+
+
+def legacy_tags(bios, terms):
+    return [[t for t in terms if t in bio] for bio in bios]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max", type=int, default=20000)
+    args = ap.parse_args()
+
+    tagger = genealogy.SPIRIT_TAGGER
+    print(f"词条数：{len(tagger.terms)}（关键词 {len(tagger.spirits)} + 同义词）")
+    probes = overlap_probes(list(tagger.terms), genealogy.WULAO_KEYWORDS)
+    for bio, old, new in zip(probes, legacy_tags(probes, genealogy.WULAO_KEYWORDS), tagger.tag_many(probes)):
+        assert set(old) <= set(new), f"{bio!r}: keyword tags {set(old) - set(new)} lost"
+    print(f"重叠词条检查：{len(probes)} 条通过")
+    # legacy：原先只查 5 个关键词；naive：同样的逐词 `in` 扩展到全部词条；kw-only：不配同义词的 SpiritTagger
+    print(f"{'bios':>8} {'legacy ms':>10} {'naive ms':>10} {'tagger ms':>10} {'kw-only ms':>10}")
+    kw_only = type(tagger)(tagger.descriptions)
+    for n in (s for s in (1000, 5000, 20000, 100000) if s <= args.max):
+        bios = synthetic_bios(n)
+        t0 = time.perf_counter()
+        legacy = legacy_tags(bios, genealogy.WULAO_KEYWORDS)
+        t1 = time.perf_counter()
+        legacy_tags(bios, list(tagger.terms))
+        t2 = time.perf_counter()
+        tagged = tagger.tag_many(bios)
+        t3 = time.perf_counter()
+        kw_only.tag_many(bios)
+        t4 = time.perf_counter()
+        # 原先按 `kw in bio` 命中的关键词必须仍被打上（同义词与关键词重叠时也不能吞掉关键词）
+        missed = [(bio, set(old) - set(new)) for bio, old, new in zip(bios, legacy, tagged) if not set(old) <= set(new)]
+        assert not missed, f"{len(missed)} bios lost keyword tags, e.g. {missed[0][1]}"
+        print(f"{n:>8} {(t1 - t0) * 1000:>10.1f} {(t2 - t1) * 1000:>10.1f} {(t3 - t2) * 1000:>10.1f} {(t4 - t3) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# benchmarks/run_benchmarks.py — 端到端基准：合成数据集上逐阶段测量耗时、峰值内存与输出体积，可与基线比较以拦截性能回退
+# 用法：
+#   python benchmarks/run_benchmarks.py                                  # 100 / 1k / 10k 人，两种关系格式
+#   python benchmarks/run_benchmarks.py --scales 100,1000,10000,100000 --out results.json
+#   python benchmarks/run_benchmarks.py --baseline results.json          # 任一阶段超出容差时退出码为 1
+# 耗时取 --repeat 次中的最小值，峰值内存另跑一遍测量（tracemalloc 会拖慢执行，不与计时同时开启）；--no-memory 只计时。
+# pandas / networkx 在开始前先导入，按需导入的一次性开销不计入首个数据集（冷启动见 bench_cold_start.py）。
+import argparse
+import importlib
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import genealogy  # noqa: E402
+from avatar_cache import AvatarCache  # noqa: E402
+from synth_genealogy import SCHEMAS, generate_dataset  # noqa: E402
+
+DEFAULT_SCALES = "100,1000,10000"
+RENDER_KWARGS = dict(accent=genealogy.THEME["gold"], edge_color=genealogy.THEME["edge"], bg_color=genealogy.THEME["bg"])
+
+
+def stages(root: Path, work: Path):
+    """(阶段名, 函数, 输出单位)。函数读写共享的 ctx，返回输出量（字节数或条目数）；同一阶段重复执行结果相同"""
+    data_dir, avatar_dir = root / "data", root / "static" / "avatars"
+    search_dirs = (avatar_dir, data_dir, root)
+    ctx = {}
+
+    def read_csv():
+        ctx["persons"] = genealogy.safe_read_csv(data_dir / "persons.csv")
+        ctx["relations"] = genealogy.safe_read_csv(data_dir / "relations.csv")
+        return (data_dir / "persons.csv").stat().st_size + (data_dir / "relations.csv").stat().st_size
+
+    def person_index():
+        ctx["index"] = genealogy.build_person_index(ctx["persons"], search_dirs)
+        return len(ctx["index"])
+
+    def parse_relations():
+        ctx["triples"] = genealogy.parse_relations(ctx["relations"])
+        return len(ctx["triples"])
+
+    def build_graph():
+        ctx["graph"] = genealogy.build_graph(ctx["triples"])
+        return ctx["graph"].number_of_nodes()
+
+    def thumbnails():
+        # 全新的缩略图缓存：每个不同头像解码、缩放、编码一次
+        thumbs = work / "thumbs"
+        shutil.rmtree(thumbs, ignore_errors=True)
+        ctx["cache"] = cache = AvatarCache(thumbs)
+        paths = {p["avatar_path"] for p in ctx["index"].values() if p["avatar_path"]}
+        return sum(len(cache.data_uri(p, genealogy.AVATAR_THUMB_SIZES["graph"])) for p in paths)
+
+    def render_html():
+        html = genealogy.render_vis_html(ctx["graph"], ctx["index"], avatar_cache=ctx["cache"], animate=False, **RENDER_KWARGS)
+        return len(html.encode("utf-8"))
+
+    def pipeline_export(mode):
+        def run():
+            # 与 app / cli 相同的导出路径：DataPipeline 读取、缓存命中判断、流式写盘（缩略图缓存已预热）
+            pipeline = genealogy.DataPipeline(data_dir, avatar_dir, avatar_cache=ctx["cache"])
+            data = pipeline.load()
+            out = pipeline.export(data, work / "export", mode=mode, animate_max_nodes=0)
+            return out["path"].stat().st_size
+        return run
+
+    return [
+        ("read_csv", read_csv, "bytes"),
+        ("build_person_index", person_index, "persons"),
+        ("parse_relations", parse_relations, "triples"),
+        ("build_graph", build_graph, "nodes"),
+        ("avatar_thumbnails", thumbnails, "bytes"),
+        ("render_vis_html", render_html, "bytes"),
+        ("export_inline", pipeline_export("inline"), "bytes"),
+        ("export_lazy", pipeline_export("lazy"), "bytes"),
+    ]
+
+
+def run_dataset(root: Path, work: Path, repeat: int, memory: bool):
+    rows = []
+    for name, fn, unit in stages(root, work):
+        seconds = float("inf")
+        for _ in range(max(1, repeat)):
+            t0 = time.perf_counter()
+            output = fn()
+            seconds = min(seconds, time.perf_counter() - t0)
+        peak = None
+        if memory:
+            tracemalloc.start()
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        rows.append({"stage": name, "seconds": seconds, "peak_bytes": peak, "output": output, "unit": unit})
+    return rows
+
+
+def compare(results, baseline, tolerance: float, min_ms: float, min_mb: float):
+    """返回超出容差的项：耗时与峰值内存只比较增长（并忽略小于 min_ms / min_mb 的绝对差），输出体积双向比较"""
+    base = {(r["persons"], r["schema"], r["stage"]): r for r in baseline["results"]}
+    problems = []
+    for r in results:
+        b = base.get((r["persons"], r["schema"], r["stage"]))
+        if b is None:
+            continue
+        label = f"{r['persons']}/{r['schema']}/{r['stage']}"
+        if r["seconds"] > b["seconds"] * (1 + tolerance) and (r["seconds"] - b["seconds"]) * 1000 > min_ms:
+            problems.append(f"{label}: 耗时 {b['seconds'] * 1000:.1f} -> {r['seconds'] * 1000:.1f} ms")
+        if r["peak_bytes"] and b.get("peak_bytes") and r["peak_bytes"] > b["peak_bytes"] * (1 + tolerance) \
+                and (r["peak_bytes"] - b["peak_bytes"]) / 1e6 > min_mb:
+            problems.append(f"{label}: 峰值内存 {b['peak_bytes'] / 1e6:.1f} -> {r['peak_bytes'] / 1e6:.1f} MB")
+        if b["output"] and abs(r["output"] - b["output"]) > b["output"] * tolerance:
+            problems.append(f"{label}: 输出 {b['output']} -> {r['output']} {r['unit']}")
+    return problems
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scales", default=DEFAULT_SCALES, help="人数，逗号分隔")
+    ap.add_argument("--schemas", default=",".join(SCHEMAS), help="关系格式：columns（source,target,relation）/ desc（描述列）")
+    ap.add_argument("--avatars", type=int, default=200, help="每个数据集的不同头像数")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--data-dir", default="", help="合成数据集存放目录（保留以便重复运行时复用）；默认用临时目录")
+    ap.add_argument("--repeat", type=int, default=3, help="每个阶段计时的重复次数（取最小值）")
+    ap.add_argument("--no-memory", action="store_true", help="不测峰值内存")
+    ap.add_argument("--out", default="", help="结果写入该 JSON 文件")
+    ap.add_argument("--baseline", default="", help="与该 JSON 结果比较，超出容差时退出码为 1")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="允许的相对增长（默认 25%%）")
+    ap.add_argument("--min-ms", type=float, default=5.0, help="耗时绝对差小于该值时不算回退")
+    ap.add_argument("--min-mb", type=float, default=1.0, help="峰值内存绝对差小于该值时不算回退")
+    args = ap.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",") if s]
+    schemas = [s for s in args.schemas.split(",") if s]
+    results = []
+    for mod in ("pandas", "networkx"):
+        importlib.import_module(mod)
+    with tempfile.TemporaryDirectory() as tmp:
+        data_root = Path(args.data_dir) if args.data_dir else Path(tmp) / "datasets"
+        print(f"{'persons':>8} {'schema':>8} {'stage':>20} {'ms':>10} {'peak MB':>8} {'output':>14}")
+        for n in scales:
+            for schema in schemas:
+                root = data_root / f"{n}_{schema}_{args.avatars}_{args.seed}"
+                if not (root / "data" / "relations.csv").exists():
+                    generate_dataset(root, n, schema, args.avatars, args.seed)
+                work = Path(tmp) / f"work_{n}_{schema}"
+                for row in run_dataset(root, work, args.repeat, not args.no_memory):
+                    row.update(persons=n, schema=schema)
+                    results.append(row)
+                    peak = f"{row['peak_bytes'] / 1e6:.1f}" if row["peak_bytes"] is not None else "-"
+                    print(f"{n:>8} {schema:>8} {row['stage']:>20} {row['seconds'] * 1000:>10.1f} {peak:>8} "
+                          f"{row['output']:>8} {row['unit']}", flush=True)
+                shutil.rmtree(work, ignore_errors=True)
+
+    report = {"meta": {"python": platform.python_version(), "platform": platform.platform(), "time": time.time(),
+                       "avatars": args.avatars, "seed": args.seed, "repeat": args.repeat, "memory": not args.no_memory},
+              "results": results}
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"结果已写入 {args.out}")
+    if args.baseline:
+        problems = compare(results, json.loads(Path(args.baseline).read_text(encoding="utf-8")),
+                           args.tolerance, args.min_ms, args.min_mb)
+        for p in problems:
+            print("回退：" + p)
+        print(f"与基线 {args.baseline} 比较：{len(problems)} 项超出容差 {args.tolerance:.0%}")
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
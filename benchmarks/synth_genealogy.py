@@ -0,0 +1,135 @@
+# benchmarks/synth_genealogy.py — 合成系谱数据集：persons.csv / relations.csv 与生成的头像图片，目录布局与本项目一致
+# 用法：python benchmarks/synth_genealogy.py OUT_DIR [--persons 10000] [--schema columns|desc] [--avatars 200] [--seed 7]
+# 生成的目录可直接交给 cli.py 导出（OUT_DIR/data/persons.csv、OUT_DIR/data/relations.csv、OUT_DIR/static/avatars/）。
+import argparse
+import csv
+import math
+import random
+import sys
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import genealogy  # noqa: E402
+
+SCHEMAS = ("columns", "desc")
+
+# 姓名字表刻意不含“是”“的”，保证“X是Y的Z”描述能被 RELATION_DESC_PATTERN 正确切分
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘蒋蔡余杜叶程魏苏吕丁任沈姚卢"
+GIVEN = "明华建国伟芳军平志强秀英文静丽敏杰涛斌超亮红玉兰峰磊勇刚海波云鹏宇辉燕琳婷晓新春林森泗天德成荣光"
+TREE_RELATIONS = ("学生", "传承人", "助手")
+TITLES = ("教授", "副教授", "高级工程师", "研究员", "讲师", "系主任", "院长", "实验室主任")
+UNITS = ("材料学院", "机械学院", "电气学院", "水利学院", "自动化学院", "理学院", "土木学院")
+SENTENCES = (
+    "{name}长期扎根教学一线，主讲多门专业基础课程，指导本科生与研究生数百人。",
+    "{name}主持完成多项国家级与省部级科研项目，成果在行业内得到推广应用。",
+    "退休后{name}继续参与关工委工作，在社区和中小学开展宣讲活动。",
+    "{name}参与筹建了学院第一个重点实验室，带领团队攻克关键工艺难题。",
+    "{name}编写出版教材与专著多部，其中一部获得省级优秀教材奖。",
+    "{name}多次被评为优秀共产党员、先进工作者。",
+    "在{unit}任职期间，{name}推动课程体系改革与实践教学基地建设。",
+)
+
+
+def person_name(i: int) -> str:
+    """第 i 个人的姓名，i 不同则姓名不同（两字或三字名，超出组合数后加数字）"""
+    s, rest = SURNAMES[i % len(SURNAMES)], i // len(SURNAMES)
+    g1, rest = GIVEN[rest % len(GIVEN)], rest // len(GIVEN)
+    if rest == 0:
+        return s + g1
+    g2, rest = GIVEN[(rest - 1) % len(GIVEN)], (rest - 1) // len(GIVEN)
+    return s + g1 + g2 + (str(rest) if rest else "")
+
+
+def synthetic_bio(rng: random.Random, name: str, terms) -> str:
+    """对数正态分布的生平长度（中位数约 300 字，上限约 4000 字），偶尔嵌入五老精神关键词 / 同义词"""
+    target = min(4000, int(rng.lognormvariate(math.log(300), 0.8)))
+    parts = []
+    length = 0
+    while length < target:
+        sent = rng.choice(SENTENCES).format(name=name, unit=rng.choice(UNITS))
+        if rng.random() < 0.15:
+            sent = sent[:-1] + f"，体现了{rng.choice(terms)}。"
+        parts.append(sent)
+        length += len(sent)
+    return "".join(parts)
+
+
+def make_avatar(path: Path, i: int, size: int = 400):
+    """纯色渐变背景 + 头部与肩部轮廓 + 少量噪点的“证件照”，JPEG 体积与真实头像同一量级"""
+    rng = random.Random(i)
+    top = tuple(rng.randint(120, 230) for _ in range(3))
+    bottom = tuple(max(0, c - rng.randint(40, 90)) for c in top)
+    grad = Image.linear_gradient("L").resize((size, size))
+    img = Image.composite(Image.new("RGB", (size, size), bottom), Image.new("RGB", (size, size), top), grad)
+    draw = ImageDraw.Draw(img)
+    skin = (rng.randint(200, 240), rng.randint(160, 200), rng.randint(130, 170))
+    cloth = tuple(rng.randint(20, 120) for _ in range(3))
+    draw.ellipse((size * 0.12, size * 0.62, size * 0.88, size * 1.3), fill=cloth)
+    draw.ellipse((size * 0.3, size * 0.18, size * 0.7, size * 0.66), fill=skin)
+    noise = Image.effect_noise((size, size), 24).convert("RGB")
+    Image.blend(img, noise, 0.08).save(path, quality=85)
+
+
+def generate_dataset(root: Path, persons: int, schema: str = "columns", avatars: int = 200, seed: int = 7) -> dict:
+    """在 root 下生成数据集，返回 {persons_csv, relations_csv, avatar_dir, relations, bad_rows}。
+    关系为随机分叉的师承树（每人指向更早的一人）加约 8% 的跨支“同事”边，另有约 0.5% 无法解析的行。"""
+    if schema not in SCHEMAS:
+        raise ValueError(f"schema 须为 {SCHEMAS} 之一")
+    rng = random.Random(seed)
+    data_dir, avatar_dir = root / "data", root / "static" / "avatars"
+    data_dir.mkdir(parents=True, exist_ok=True)
+    avatar_dir.mkdir(parents=True, exist_ok=True)
+    for i in range(avatars):
+        path = avatar_dir / f"a{i:04d}.jpg"
+        if not path.exists():
+            make_avatar(path, i)
+
+    terms = list(genealogy.SPIRIT_TAGGER.terms)
+    names = [person_name(i) for i in range(persons)]
+    persons_csv = data_dir / "persons.csv"
+    with open(persons_csv, "w", encoding="utf-8-sig", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["name", "avatar", "intro", "bio", "time", "is_wulao"])
+        for i, name in enumerate(names):
+            avatar = f"a{rng.randrange(avatars):04d}.jpg" if avatars and rng.random() < 0.85 else ""
+            intro = f"{rng.choice(UNITS)}{rng.choice(TITLES)}"
+            year = rng.randint(1930, 1975)
+            w.writerow([name, avatar, intro, synthetic_bio(rng, name, terms), f"{year}–", "1" if rng.random() < 0.05 else ""])
+
+    edges = []
+    for i in range(1, persons):
+        parent = max(0, (i - 1) // rng.randint(2, 5))
+        edges.append((names[i], names[parent], rng.choice(TREE_RELATIONS)))
+        if i > 10 and rng.random() < 0.08:
+            edges.append((names[i], names[rng.randrange(i)], "同事"))
+    bad_rows = 0
+    relations_csv = data_dir / "relations.csv"
+    with open(relations_csv, "w", encoding="utf-8-sig", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["source", "target", "relation"] if schema == "columns" else ["描述"])
+        for s, t, r in edges:
+            if rng.random() < 0.005:
+                bad_rows += 1
+                w.writerow([s, "", r] if schema == "columns" else [f"{s}与{t}曾共事"])
+            else:
+                w.writerow([s, t, r] if schema == "columns" else [f"{s}是{t}的{r}"])
+    return {"persons_csv": persons_csv, "relations_csv": relations_csv, "avatar_dir": avatar_dir,
+            "relations": len(edges), "bad_rows": bad_rows}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("out_dir")
+    ap.add_argument("--persons", type=int, default=10000)
+    ap.add_argument("--schema", choices=SCHEMAS, default="columns")
+    ap.add_argument("--avatars", type=int, default=200, help="不同头像图片数（人物随机引用，约 15%% 人物无头像）")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    info = generate_dataset(Path(args.out_dir), args.persons, args.schema, args.avatars, args.seed)
+    print(f"{args.persons} 人，{info['relations']} 条关系（{info['bad_rows']} 行无法解析），{args.avatars} 张头像 -> {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# cli.py — 命令行批量导出（不依赖 Streamlit，可用于定时任务）
+"""
+用法示例：
+  python cli.py .                                   # 导出当前项目（data/、static/avatars/）到 ./exports/
+  python cli.py depts/* --jobs 4 --mode lazy        # 并行导出多个数据集
+  python cli.py depts/* --out-dir build --layout generation --qr-url https://example.org/genealogy
+
+数据集目录可以与本项目布局相同（data/persons.csv、data/relations.csv、static/avatars/），
+也可以直接包含 persons.csv / relations.csv（头像放在同级 avatars/ 目录）。
+输入（CSV 与头像目录）及导出选项未变化、且导出文件仍在时跳过该数据集；--force 强制重建。
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from avatar_cache import AvatarCache, atomic_write
+from genealogy import ANIMATION_MAX_NODES, LAYOUT_METHODS, THEME, DataPipeline, generate_qr_for_url, img_to_base64
+
+MANIFEST_NAME = ".export_manifest.json"
+
+
+def resolve_dataset(path: Path) -> Tuple[Path, Path]:
+    """返回 (数据目录, 头像目录)"""
+    if (path / "data" / "persons.csv").exists():
+        return path / "data", path / "static" / "avatars"
+    if (path / "persons.csv").exists():
+        return path, path / "avatars"
+    raise FileNotFoundError(f"{path} 下未找到 persons.csv 或 data/persons.csv")
+
+
+def build_dataset(root: str, out_dir: Optional[str], mode: str, layout: str, use_atlas: bool,
+                  animate_max_nodes: int, qr_url: str, bg_image: str, force: bool) -> dict:
+    """导出单个数据集，返回 {dataset, status: built|skipped|failed, outputs, seconds, error}"""
+    t0 = time.perf_counter()
+    root_path = Path(root).resolve()
+    result = {"dataset": str(root), "status": "failed", "outputs": [], "seconds": 0.0, "error": ""}
+    try:
+        data_dir, avatar_dir = resolve_dataset(root_path)
+        out = Path(out_dir).resolve() / root_path.name if out_dir else root_path / "exports"
+        pipeline = DataPipeline(data_dir, avatar_dir, avatar_cache=AvatarCache(root_path / ".cache" / "thumbs"),
+                                cache_dir=root_path / ".cache")
+
+        options = {"mode": mode, "layout": layout, "atlas": use_atlas, "animate_max_nodes": animate_max_nodes,
+                   "qr_url": qr_url, "bg_image": bg_image}
+        bg_path = Path(bg_image) if bg_image else None
+        fingerprint = repr((pipeline.input_key(),
+                            pipeline.file_fingerprint(bg_path) if bg_path else None,
+                            sorted(options.items())))
+        manifest_path = out / MANIFEST_NAME
+        if not force and manifest_path.exists():
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            if manifest.get("fingerprint") == fingerprint and all((out / o).exists() for o in manifest.get("outputs", [])):
+                result.update(status="skipped", outputs=manifest["outputs"])
+                return result
+
+        data = pipeline.load()
+        if data["persons"].empty or not data["triples"]:
+            raise ValueError("persons.csv 为空或 relations.csv 未解析到任何关系")
+        bg_color = f"url('{img_to_base64(str(bg_path))}')" if bg_path else THEME["bg"]
+        exported = pipeline.export(data, out, mode=mode, bg_color=bg_color, layout=layout,
+                                   animate_max_nodes=animate_max_nodes, use_atlas=use_atlas)
+        outputs = [exported["path"].name]
+        if qr_url:
+            generate_qr_for_url(qr_url, out / "qr_for_export.png")
+            outputs.append("qr_for_export.png")
+        atomic_write(manifest_path, json.dumps({"fingerprint": fingerprint, "outputs": outputs}, ensure_ascii=False).encode("utf-8"))
+        result.update(status="built", outputs=outputs)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        result["seconds"] = time.perf_counter() - t0
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="五老精神系谱：命令行批量导出 HTML / 二维码")
+    ap.add_argument("datasets", nargs="+", help="数据集目录（可多个）")
+    ap.add_argument("--out-dir", default="", help="输出根目录，每个数据集写入 <out-dir>/<数据集目录名>/；默认写入各数据集的 exports/")
+    ap.add_argument("--mode", choices=("inline", "lazy"), default="inline", help="inline 单文件 HTML；lazy 轻量 ZIP 包")
+    ap.add_argument("--layout", choices=LAYOUT_METHODS, default="physics")
+    ap.add_argument("--atlas", action="store_true", help="头像打包为图集")
+    ap.add_argument("--animate-max-nodes", type=int, default=ANIMATION_MAX_NODES)
+    ap.add_argument("--qr-url", default="", help="同时生成指向该 URL 的二维码")
+    ap.add_argument("--bg-image", default="", help="页面背景图片")
+    ap.add_argument("--jobs", type=int, default=1, help="并行进程数")
+    ap.add_argument("--force", action="store_true", help="忽略缓存，强制重建")
+    args = ap.parse_args(argv)
+
+    jobs = [(d, args.out_dir or None, args.mode, args.layout, args.atlas, args.animate_max_nodes,
+             args.qr_url, args.bg_image, args.force) for d in args.datasets]
+    results = []
+    if args.jobs <= 1 or len(jobs) == 1:
+        for job in jobs:
+            results.append(build_dataset(*job))
+            _report(results[-1])
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            for fut in as_completed([pool.submit(build_dataset, *job) for job in jobs]):
+                results.append(fut.result())
+                _report(results[-1])
+
+    failed = [r for r in results if r["status"] == "failed"]
+    built = sum(r["status"] == "built" for r in results)
+    print(f"完成：构建 {built}，跳过 {len(results) - built - len(failed)}，失败 {len(failed)}")
+    return 1 if failed else 0
+
+
+def _report(r: dict):
+    detail = r["error"] if r["status"] == "failed" else ", ".join(r["outputs"])
+    print(f"[{r['status']:>7}] {r['dataset']} ({r['seconds']:.2f}s) {detail}", flush=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
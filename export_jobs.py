@@ -0,0 +1,153 @@
+# export_jobs.py — 后台导出任务（线程池执行，进度 / 取消，按输入与主题哈希缓存导出结果）
+import hashlib
+import json
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+from avatar_cache import atomic_write
+from genealogy import ANIMATION_MAX_NODES, THEME, DataPipeline
+
+RESULT_NAME = "result.json"
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class ExportJob:
+    """一次导出任务的状态：queued / running / done / failed / cancelled；progress 为 0~1"""
+
+    def __init__(self, key: str, mode: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.mode = mode
+        self.status = "queued"
+        self.progress = 0.0
+        self.result: Optional[dict] = None
+        self.error = ""
+        self.cached = False
+        self.created = time.time()
+        self.seconds = 0.0
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def cancel(self):
+        self._cancel.set()
+        if self.status == "queued":
+            self.status = "cancelled"
+
+    def _report(self, done: int, total: int):
+        if self._cancel.is_set():
+            raise ExportCancelled()
+        self.progress = done / total if total else 1.0
+
+
+class ExportJobs:
+    """导出任务管理。
+
+    - 导出在线程池中执行，Streamlit 脚本线程只负责提交与查询状态；
+    - 结果按 (数据指纹, 导出模式, 主题, 背景, 布局, 动画, 图集) 的哈希存放在 out_root/<哈希>/，
+      成功后写入 result.json，相同参数再次导出时直接返回已有文件；
+    - 同一参数的任务正在排队或执行时，重复提交返回同一个任务；
+    - 已结束的任务记录保留 job_ttl 秒、最多 keep_jobs 条（每次提交时清理），会话持有的过期任务 id 查询不到时按无任务处理。
+    用线程而非进程：导出要复用流水线里已解析的数据与头像缩略图缓存，进程池需要把整份数据序列化过去。
+    """
+
+    def __init__(self, pipeline: DataPipeline, out_root: Path, max_workers: int = 2, keep_results: int = 20,
+                 keep_jobs: int = 200, job_ttl: float = 3600.0):
+        self.pipeline = pipeline
+        self.out_root = Path(out_root)
+        self.keep_results = keep_results
+        self.keep_jobs = keep_jobs
+        self.job_ttl = job_ttl
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="export")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, ExportJob] = {}
+        self._active: Dict[str, ExportJob] = {}   # 结果哈希 -> 未结束的任务
+
+    def export_key(self, data: dict, mode: str, bg_color: str, layout: str, animate_max_nodes: int, use_atlas: bool) -> str:
+        animate = data["graph"].number_of_nodes() <= animate_max_nodes
+        raw = repr((data["key"], mode, THEME["gold"], THEME["edge"], hashlib.sha1(bg_color.encode("utf-8")).hexdigest(),
+                    layout, animate, use_atlas))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+    def cached_result(self, key: str) -> Optional[dict]:
+        """out_root/<key>/result.json 存在且导出文件仍在时返回结果"""
+        path = self.out_root / key / RESULT_NAME
+        try:
+            result = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        result["path"] = self.out_root / key / result["file"]
+        return result if result["path"].exists() else None
+
+    def submit(self, data: dict, mode: str = "inline", bg_color: str = THEME["bg"], layout: str = "physics",
+               animate_max_nodes: int = ANIMATION_MAX_NODES, use_atlas: bool = False) -> ExportJob:
+        key = self.export_key(data, mode, bg_color, layout, animate_max_nodes, use_atlas)
+        with self._lock:
+            active = self._active.get(key)
+            if active is not None and not active.finished:
+                return active
+            self._forget_finished()
+            job = ExportJob(key, mode)
+            self._jobs[job.id] = job
+            cached = self.cached_result(key)
+            if cached is not None:
+                (self.out_root / key / RESULT_NAME).touch()
+                job.status, job.progress, job.result, job.cached = "done", 1.0, cached, True
+                return job
+            self._active[key] = job
+        self._pool.submit(self._run, job, data, dict(mode=mode, bg_color=bg_color, layout=layout,
+                                                     animate_max_nodes=animate_max_nodes, use_atlas=use_atlas))
+        return job
+
+    def _forget_finished(self):
+        """丢弃超过 job_ttl 的已结束任务，并把已结束任务数压到 keep_jobs 以内（先丢最早的；调用方持有 self._lock）"""
+        cutoff = time.time() - self.job_ttl
+        finished = [job for job in self._jobs.values() if job.finished]
+        excess = len(finished) - self.keep_jobs
+        for i, job in enumerate(finished):   # dict 按提交顺序排列
+            if i < excess or job.created < cutoff:
+                del self._jobs[job.id]
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        return self._jobs.get(job_id)
+
+    def _run(self, job: ExportJob, data: dict, options: dict):
+        if job.status == "cancelled":
+            return
+        job.status = "running"
+        t0 = time.perf_counter()
+        out_dir = self.out_root / job.key
+        try:
+            result = self.pipeline.export(data, out_dir, progress=job._report, **options)
+            result["file"] = result.pop("path").name
+            atomic_write(out_dir / RESULT_NAME, json.dumps(result, ensure_ascii=False).encode("utf-8"))
+            result["path"] = out_dir / result["file"]
+            job.result, job.progress, job.status = result, 1.0, "done"
+            self._prune()
+        except ExportCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = "failed"
+        finally:
+            job.seconds = time.perf_counter() - t0
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+
+    def _prune(self):
+        """只保留最近 keep_results 份导出结果"""
+        dirs = [d for d in self.out_root.iterdir() if (d / RESULT_NAME).exists()] if self.out_root.exists() else []
+        dirs.sort(key=lambda d: (d / RESULT_NAME).stat().st_mtime, reverse=True)
+        for d in dirs[self.keep_results:]:
+            shutil.rmtree(d, ignore_errors=True)
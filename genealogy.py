@@ -0,0 +1,1206 @@
+# genealogy.py — 系谱数据处理与图谱渲染（不依赖 Streamlit，供 app.py 与命令行导出 cli.py 共用）
+# pandas / networkx / qrcode 在用到的函数内导入：应用启动与 `cli.py --help` 不为它们付出导入时间。
+from __future__ import annotations
+
+import os
+import re
+import json
+import math
+import base64
+import hashlib
+import importlib.util
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from avatar_cache import AvatarCache, PLACEHOLDER, atomic_open, atomic_write, file_digest, resize_to_jpeg
+from profiling import PROFILER
+from shared_cache import SharedCache
+from spirit_tags import SpiritTagger
+
+if TYPE_CHECKING:
+    import networkx as nx
+    import pandas as pd
+
+# ---------------- basic config ----------------
+ROOT = Path.cwd()
+DATA_DIR = ROOT / "data"
+AVATAR_DIR = ROOT / "static" / "avatars"
+EXPORT_DIR = ROOT / "exports"
+CACHE_DIR = ROOT / ".cache"
+
+# 头像缩略图尺寸：图谱节点 / 名录卡片（约 2 倍显示尺寸，兼顾高分屏）、轻量包占位图、详情弹窗
+AVATAR_THUMB_SIZES = {"graph": 128, "directory": 192, "inline": 40, "detail": 440}
+
+# 服务端布局方法（physics 表示交给浏览器端物理模拟）
+LAYOUT_METHODS = ("physics", "spring", "generation")
+# networkx 的 spring_layout 在该节点数及以上改用依赖 scipy 的稀疏实现；未安装 scipy 时改用 numpy_spring_layout
+SPRING_SCIPY_MIN_NODES = 500
+# numpy_spring_layout 每次迭代两两计算斥力，迭代次数按 节点对数 × 迭代次数 不超过该值截断
+SPRING_PAIR_BUDGET = 200_000_000
+# 力导向布局每次迭代都是 O(V²)（networkx 的 scipy 实现也一样），节点数超过该值时改用 generation_layout
+SPRING_MAX_NODES = 4000
+# 节点数超过该值时跳过入场放大动画
+ANIMATION_MAX_NODES = 300
+# 把已缓存的 HTML 写盘时每次编码的字符数，避免一次性生成整份 bytes 副本
+EXPORT_CHUNK_CHARS = 1 << 20
+# 导出进度回调的节点间隔
+PROGRESS_EVERY = 50
+
+# 主题色：深红 + 更亮金色
+THEME = {
+    "accent": "#8B0000",   # 深红
+    "edge": "#8b4513",     # 棕边
+    "bg": "#8B0000",       # 页面纯红背景（默认）
+    "gold": "#FFD60A",     # 更亮的金色
+    "yellow": "#FFD800"    # 黄色（副标题）
+}
+
+# 五老精神（说明、同义词与权重均以 config.json 为准，用于左侧导出说明与精神标签识别）
+CONFIG_PATH = Path(__file__).resolve().parent / "config.json"
+SPIRIT_TAGGER = SpiritTagger.from_config(CONFIG_PATH)
+WULAO = SPIRIT_TAGGER.descriptions
+WULAO_KEYWORDS = SPIRIT_TAGGER.spirits
+
+# ---------------- helpers ----------------
+@PROFILER.timed("read_csv")
+def safe_read_csv(path: Path) -> pd.DataFrame:
+    import pandas as pd
+    if path.exists():
+        try:
+            return pd.read_csv(path, dtype=str, encoding="utf-8-sig").fillna("")
+        except Exception:
+            return pd.DataFrame()
+    return pd.DataFrame()
+
+def img_to_base64(path: str) -> str:
+    """将图片文件转为 data:...;base64, 若失败返回占位图"""
+    if not path:
+        return PLACEHOLDER
+    p = Path(path)
+    if not p.exists():
+        return PLACEHOLDER
+    ext = p.suffix.lower()
+    mime = "image/png" if ext == ".png" else "image/jpeg"
+    try:
+        with open(p, "rb") as f:
+            b = base64.b64encode(f.read()).decode("utf-8")
+        return f"data:{mime};base64,{b}"
+    except Exception:
+        return PLACEHOLDER
+
+def pil_resize_and_save(file_bytes: bytes, out_path: Path, max_w=1600, max_h=1200, quality=85):
+    """调整并保存图片（用于上传背景 / 头像 / logo）"""
+    atomic_write(out_path, resize_to_jpeg(file_bytes, max_w, max_h, quality))
+    return out_path
+
+@PROFILER.timed("resolve_avatar")
+def find_avatar_path(avatar_field: str, search_dirs: Optional[Sequence[Path]] = None) -> str:
+    """尝试从绝对路径、static/avatars、data/、ROOT 中寻找头像文件；search_dirs 可替换后三者（用于其他数据集）"""
+    if not avatar_field or not str(avatar_field).strip():
+        return ""
+    p = Path(str(avatar_field))
+    if p.is_absolute() and p.exists():
+        return str(p)
+    # try static avatars, data/, project root
+    for base in (search_dirs if search_dirs is not None else (AVATAR_DIR, DATA_DIR, ROOT)):
+        cand = Path(base) / str(avatar_field)
+        if cand.exists():
+            return str(cand)
+    return ""
+
+@PROFILER.timed("build_person_index")
+def build_person_index(persons_df: pd.DataFrame, search_dirs: Optional[Sequence[Path]] = None,
+                       tagger: Optional[SpiritTagger] = None) -> Dict[str, dict]:
+    """由 persons.csv 一次性构建 name -> 人物记录 的索引（头像路径、精神标签、是否五老均已解析）。
+    同名人物只保留第一条，与原先 persons_df[persons_df['name'] == n].iloc[0] 的取值一致。"""
+    index: Dict[str, dict] = {}
+    if persons_df.empty or "name" not in persons_df.columns:
+        return index
+    records = persons_df.to_dict("records")
+    if "spirit_tags" in persons_df.columns:
+        # SQLite 后端的 persons 表已带预先算好的 spirit_tags 列（且不含 bio）
+        all_tags = [[t for t in (rec["spirit_tags"] or "").split(",") if t] for rec in records]
+    else:
+        all_tags = (tagger or SPIRIT_TAGGER).tag_many(rec.get("bio", "") for rec in records)
+    for rec, spirit_tags in zip(records, all_tags):
+        name = rec.get("name", "")
+        if not name or name in index:
+            continue
+        bio = rec.get("bio", "") or ""
+        avatar_field = rec.get("avatar", "") or ""
+        is_wulao = str(rec.get("is_wulao", "")).strip() == "1"
+        index[name] = {
+            "name": name,
+            "intro": rec.get("intro", "") or "",
+            "bio": bio,
+            "avatar": avatar_field,
+            "avatar_path": find_avatar_path(avatar_field, search_dirs) if avatar_field else "",
+            "spirit_tags": spirit_tags,
+            "is_wulao": is_wulao,
+            "highlight": bool(spirit_tags) or is_wulao,
+            # 名录检索用：姓名 / 简介 / 精神标签，预先拼好并转小写
+            "search_text": "\n".join([name, rec.get("intro", "") or ""] + spirit_tags).lower(),
+        }
+    return index
+
+def search_persons(person_index: Dict[str, dict], query: str = "", spirits: Sequence[str] = (),
+                   wulao_only: bool = False) -> List[dict]:
+    """在人物索引中检索：query 匹配姓名 / 简介 / 精神标签；spirits 命中任一即保留；wulao_only 只保留高亮人物"""
+    q = query.strip().lower()
+    wanted = set(spirits)
+    out = []
+    for p in person_index.values():
+        if q and q not in p["search_text"]:
+            continue
+        if wanted and not wanted.intersection(p["spirit_tags"]):
+            continue
+        if wulao_only and not p["highlight"]:
+            continue
+        out.append(p)
+    return out
+
+def paginate(items: Sequence, page: int, per_page: int) -> Tuple[Sequence, int]:
+    """返回 (第 page 页的条目, 总页数)，page 从 1 开始，越界时取最近的有效页"""
+    pages = max(1, (len(items) + per_page - 1) // per_page)
+    page = min(max(1, page), pages)
+    return items[(page - 1) * per_page: page * per_page], pages
+
+RELATION_DESC_PATTERN = re.compile(r"^([\u4e00-\u9fa5A-Za-z0-9_\-\s]{1,60})是([\u4e00-\u9fa5A-Za-z0-9_\-\s]{0,60})的([\u4e00-\u9fa5A-Za-z0-9_\-\s]{1,60})")
+RELATION_SAMPLE_LIMIT = 5
+
+@PROFILER.timed("parse_relations")
+def parse_relations_with_report(rel_df: pd.DataFrame) -> Tuple[List[Tuple[str,str,str]], dict]:
+    """向量化解析 relations.csv，返回 (三元组列表, 解析报告)。
+    报告含 total / parsed / skipped 以及若干未能解析的样例行 samples: [(CSV 行号, 原文), ...]"""
+    report = {"total": len(rel_df), "parsed": 0, "skipped": 0, "samples": []}
+    if rel_df.empty:
+        return [], report
+    import pandas as pd
+    cols_lower = [c.lower() for c in rel_df.columns]
+    if "source" in cols_lower and "target" in cols_lower:
+        df = rel_df.copy()
+        df.columns = cols_lower
+        df = df.loc[:, ~df.columns.duplicated()]
+        src = df["source"].astype(str).str.strip()
+        tgt = df["target"].astype(str).str.strip()
+        rel = df["relation"].astype(str).str.strip() if "relation" in df.columns else pd.Series("", index=df.index)
+        rel = rel.mask(rel == "", "关系")
+        ok = (src != "") & (tgt != "")
+        triples = list(zip(src[ok].tolist(), rel[ok].tolist(), tgt[ok].tolist()))
+        shown = df[[c for c in ("source", "target", "relation") if c in df.columns]]
+    elif "描述" in rel_df.columns:
+        desc = rel_df["描述"].astype(str)
+        # str.extract 对该正则会逐行回退到 Python re，实测比批量 map(pat.match) 更慢；
+        # 因此正则匹配一次性批量完成，去空白与过滤再交给向量化的 pandas 操作
+        empty = ("", "", "")
+        groups = [m.groups() if m else empty for m in map(RELATION_DESC_PATTERN.match, desc.tolist())]
+        parts = pd.DataFrame(groups, index=desc.index, columns=["s", "o", "r"], dtype=object)
+        subj = parts["s"].str.strip()
+        obj = parts["o"].str.strip()
+        rel = parts["r"].str.strip()
+        ok = (subj != "") & (obj != "")
+        triples = list(zip(subj[ok].tolist(), rel[ok].tolist(), obj[ok].tolist()))
+        shown = rel_df[["描述"]]
+    else:
+        triples = []
+        ok = pd.Series(False, index=rel_df.index)
+        shown = rel_df
+    bad_pos = (~ok).to_numpy().nonzero()[0]
+    report["parsed"] = len(triples)
+    report["skipped"] = len(bad_pos)
+    # 只为前几行未解析数据拼接样例；行号按 CSV 文件计（表头占第 1 行）
+    report["samples"] = [(int(pos) + 2, ",".join(str(v) for v in shown.iloc[pos]))
+                         for pos in bad_pos[:RELATION_SAMPLE_LIMIT]]
+    return triples, report
+
+def parse_relations(rel_df: pd.DataFrame) -> List[Tuple[str,str,str]]:
+    return parse_relations_with_report(rel_df)[0]
+
+@PROFILER.timed("build_graph")
+def build_graph(triples: List[Tuple[str,str,str]]) -> nx.DiGraph:
+    """同一对人物之间的多条关系合并为一条边：label 为最后出现的关系（用于显示），relations 保留全部关系类型"""
+    import networkx as nx
+    G = nx.DiGraph()
+    for s, r, t in triples:
+        G.add_node(s)
+        G.add_node(t)
+        r = r or ""
+        if G.has_edge(s, t):
+            d = G[s][t]
+            if r not in d["relations"]:
+                d["relations"].append(r)
+            d["label"] = r
+        else:
+            G.add_edge(s, t, label=r, relations=[r])
+    return G
+
+def edge_relations(d: dict) -> List[str]:
+    """边上的全部关系类型（见 build_graph）"""
+    return d.get("relations") or [d.get("label", "")]
+
+def generate_qr_for_url(url: str, out_path: Path):
+    import qrcode
+    img = qrcode.make(url)
+    img.save(out_path)
+    return out_path
+
+# ---------------- graph queries ----------------
+class RelationRules:
+    """关系类型的长幼方向（config.json 的 relation_direction）。
+
+    图中的边沿用 relations.csv 的写法：“X是Y的Z” 为 X -> Y。
+    - 默认 Y 为长辈（学生、传承人、助手等）；
+    - senior_source 中的类型（老师、前辈学者等）X 为长辈；
+    - peer 中的类型（同事等）为同辈，世系查询与代际分层都不把它算作一代。
+    """
+
+    def __init__(self, senior_source: Iterable[str] = (), peer: Iterable[str] = ()):
+        self.senior_source = frozenset(senior_source)
+        self.peer = frozenset(peer)
+        self.fingerprint = hashlib.sha1(json.dumps(
+            [sorted(self.senior_source), sorted(self.peer)], ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+
+    @classmethod
+    def from_config(cls, path: Path) -> "RelationRules":
+        try:
+            cfg = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            cfg = {}
+        rules = cfg.get("relation_direction", {})
+        return cls(rules.get("senior_source", ()), rules.get("peer", ()))
+
+    def senior_junior(self, u: str, v: str, rel: str) -> Optional[Tuple[str, str]]:
+        """边 u -> v（关系 rel）的 (长辈, 晚辈)；同辈关系返回 None"""
+        if rel in self.peer:
+            return None
+        return (u, v) if rel in self.senior_source else (v, u)
+
+RELATION_RULES = RelationRules.from_config(CONFIG_PATH)
+
+
+class GraphIndex:
+    """图查询索引：预先建好出边 / 入边邻接表、按长幼方向整理的上下代邻接表和按关系类型分组的边。
+    邻域、世系、关系类型查询只遍历涉及的节点与边，不扫描整张图。
+
+    succ / pred 沿用 relations.csv 的边方向（“X是Y的Z” 为 X -> Y），用于邻域与取子图；
+    up / down 按 RelationRules 换算成 晚辈 -> 长辈 / 长辈 -> 晚辈，世系的上溯 / 下延沿它们走，同辈关系不计入。
+    """
+
+    def __init__(self, G: nx.DiGraph, rules: Optional[RelationRules] = None):
+        rules = rules or RELATION_RULES
+        self.position: Dict[str, int] = {n: i for i, n in enumerate(G.nodes())}
+        self.succ: Dict[str, List[Tuple[str, str]]] = {n: [] for n in G.nodes()}
+        self.pred: Dict[str, List[Tuple[str, str]]] = {n: [] for n in G.nodes()}
+        self.up: Dict[str, List[Tuple[str, str]]] = {n: [] for n in G.nodes()}
+        self.down: Dict[str, List[Tuple[str, str]]] = {n: [] for n in G.nodes()}
+        self.nodes_by_relation: Dict[str, set] = {}
+        for u, v, d in G.edges(data=True):
+            for rel in edge_relations(d):
+                self.succ[u].append((v, rel))
+                self.pred[v].append((u, rel))
+                pair = rules.senior_junior(u, v, rel)
+                if pair is not None:
+                    senior, junior = pair
+                    self.up[junior].append((senior, rel))
+                    self.down[senior].append((junior, rel))
+                self.nodes_by_relation.setdefault(rel, set()).update((u, v))
+        self.relations = sorted(self.nodes_by_relation)
+
+    def _walk(self, start: str, depth: int, adjs: Sequence[Dict[str, List[Tuple[str, str]]]], relation: Optional[str]) -> set:
+        if start not in self.position:
+            return set()
+        seen = {start}
+        frontier = [start]
+        for _ in range(max(0, depth)):
+            nxt = []
+            for n in frontier:
+                for adj in adjs:
+                    for m, rel in adj[n]:
+                        if relation and rel != relation:
+                            continue
+                        if m not in seen:
+                            seen.add(m)
+                            nxt.append(m)
+            if not nxt:
+                break
+            frontier = nxt
+        return seen
+
+    def ego(self, center: str, k: int, relation: Optional[str] = None) -> set:
+        """center 的 k 跳邻域（不分方向）"""
+        return self._walk(center, k, (self.succ, self.pred), relation)
+
+    def lineage(self, center: str, up: int, down: int, relation: Optional[str] = None) -> set:
+        """center 向上 up 代（长辈）、向下 down 代（晚辈）的世系"""
+        return self._walk(center, up, (self.up,), relation) | self._walk(center, down, (self.down,), relation)
+
+    def with_relation(self, relation: str) -> set:
+        return set(self.nodes_by_relation.get(relation, ()))
+
+    def subgraph(self, nodes: set, relation: Optional[str] = None) -> nx.DiGraph:
+        """由节点集合取子图，节点保持原图顺序；relation 给出时只保留该类型的边"""
+        import networkx as nx
+        H = nx.DiGraph()
+        ordered = sorted((n for n in nodes if n in self.position), key=self.position.__getitem__)
+        H.add_nodes_from(ordered)
+        for u in ordered:
+            for v, rel in self.succ[u]:
+                if v in nodes and (not relation or rel == relation):
+                    if H.has_edge(u, v):
+                        H[u][v]["relations"].append(rel)
+                        H[u][v]["label"] = rel
+                    else:
+                        H.add_edge(u, v, label=rel, relations=[rel])
+        return H
+
+# ---------------- graph layout ----------------
+def seniority_graph(G: nx.DiGraph, rules: Optional[RelationRules] = None) -> nx.DiGraph:
+    """按 RelationRules 把边换算成 晚辈 -> 长辈 的有向图（节点与 G 相同，同辈关系不含在内）"""
+    import networkx as nx
+    rules = rules or RELATION_RULES
+    H = nx.DiGraph()
+    H.add_nodes_from(G.nodes())
+    for u, v, d in G.edges(data=True):
+        for rel in edge_relations(d):
+            pair = rules.senior_junior(u, v, rel)
+            if pair is not None:
+                H.add_edge(pair[1], pair[0])
+    return H
+
+def generation_layout(G: nx.DiGraph, x_gap: float = 170.0, y_gap: float = 230.0,
+                      rules: Optional[RelationRules] = None) -> Dict[str, Tuple[float, float]]:
+    """按代际分层：长辈（方向见 RelationRules）在上层，环路按强连通分量合并为同一层；
+    只有同辈关系的人物与相连的同辈放在同一层。每层按上层相连节点的平均横坐标排序，减少连线交叉。整体 O(V+E)。"""
+    if G.number_of_nodes() == 0:
+        return {}
+    import networkx as nx
+    H = seniority_graph(G, rules)
+    C = nx.condensation(H)
+    mapping = C.graph["mapping"]
+    comp_level: Dict[int, int] = {}
+    for c in reversed(list(nx.topological_sort(C))):
+        comp_level[c] = max((comp_level[t] + 1 for t in C.successors(c)), default=0)
+    level = {n: comp_level[mapping[n]] for n in G.nodes() if H.degree(n)}
+    # 没有长幼关系的人物沿同辈关系取相邻人物的层（按广度优先），完全孤立的放在顶层
+    queue = list(level)
+    for m in queue:
+        for n in nx.all_neighbors(G, m):
+            if n not in level:
+                level[n] = level[m]
+                queue.append(n)
+    levels: Dict[int, List[str]] = {}
+    for n in G.nodes():
+        levels.setdefault(level.get(n, 0), []).append(n)
+
+    pos: Dict[str, Tuple[float, float]] = {}
+    for lv in sorted(levels):
+        members = levels[lv]
+        def barycenter(n):
+            xs = [pos[t][0] for t in (H.successors(n) if H.out_degree(n) else nx.all_neighbors(G, n)) if t in pos]
+            return sum(xs) / len(xs) if xs else 0.0
+        if lv > 0:
+            members.sort(key=barycenter)
+        offset = (len(members) - 1) / 2.0
+        for i, n in enumerate(members):
+            pos[n] = ((i - offset) * x_gap, lv * y_gap)
+    return pos
+
+def spring_backend(num_nodes: int) -> str:
+    """该规模的 spring 布局实际使用的实现：networkx / numpy（大图且未安装 scipy）/ generation（超过 SPRING_MAX_NODES）"""
+    if num_nodes > SPRING_MAX_NODES:
+        return "generation"
+    if num_nodes >= SPRING_SCIPY_MIN_NODES and importlib.util.find_spec("scipy") is None:
+        return "numpy"
+    return "networkx"
+
+def numpy_spring_layout(G: nx.DiGraph, iterations: int = 50, seed: int = 42,
+                        rules: Optional[RelationRules] = None) -> Dict[str, Tuple[float, float]]:
+    """只依赖 numpy 的 Fruchterman-Reingold 力导向布局，坐标范围 [-1, 1]，与 nx.spring_layout 一致。
+    以 generation_layout 为初始位置，迭代次数少时也能得到层次清楚的结果；斥力按行分块计算，内存 O(V)，
+    迭代次数按 SPRING_PAIR_BUDGET 截断（节点数不超过 SPRING_MAX_NODES 时至少约 12 次）。"""
+    import numpy as np
+    nodes = list(G.nodes())
+    n = len(nodes)
+    if n == 1:
+        return {nodes[0]: (0.0, 0.0)}
+    rng = np.random.default_rng(seed)
+    start = generation_layout(G, rules=rules)
+    pos = np.array([start[v] for v in nodes], dtype=np.float32)
+    span = pos.max(axis=0) - pos.min(axis=0)
+    pos = (pos - pos.min(axis=0)) / np.where(span > 0, span, 1.0) + rng.random((n, 2), dtype=np.float32) * 0.01
+    index = {v: i for i, v in enumerate(nodes)}
+    edges = np.array([(index[u], index[v]) for u, v in G.edges() if u != v], dtype=np.intp).reshape(-1, 2)
+    k = math.sqrt(1.0 / n)
+    iterations = max(1, min(iterations, SPRING_PAIR_BUDGET // (n * n)))
+    t = 0.1
+    dt = t / (iterations + 1)
+    chunk = max(1, 1_000_000 // n)
+    disp = np.empty_like(pos)
+    for _ in range(iterations):
+        x, y = pos[:, 0], pos[:, 1]
+        for s in range(0, n, chunk):
+            dx = x[s:s + chunk, None] - x
+            dy = y[s:s + chunk, None] - y
+            w = dx * dx + dy * dy
+            np.maximum(w, 1e-4, out=w)
+            np.divide(k * k, w, out=w)
+            disp[s:s + chunk, 0] = (dx * w).sum(axis=1)
+            disp[s:s + chunk, 1] = (dy * w).sum(axis=1)
+        if len(edges):
+            delta = pos[edges[:, 0]] - pos[edges[:, 1]]
+            pull = delta * (np.sqrt((delta ** 2).sum(axis=1)) / k)[:, None]
+            np.subtract.at(disp, edges[:, 0], pull)
+            np.add.at(disp, edges[:, 1], pull)
+        length = np.maximum(np.sqrt((disp ** 2).sum(axis=1)), 0.01)
+        pos += disp * (t / length)[:, None]
+        t -= dt
+    pos -= pos.mean(axis=0)
+    lim = np.abs(pos).max()
+    if lim > 0:
+        pos /= lim
+    return {v: (float(x), float(y)) for v, (x, y) in zip(nodes, pos)}
+
+@PROFILER.timed("compute_layout")
+def compute_layout(G: nx.DiGraph, method: str, rules: Optional[RelationRules] = None) -> Dict[str, Tuple[float, float]]:
+    """服务端计算节点坐标（vis.js 坐标系）。spring 的实际实现见 spring_backend：
+    缺少 scipy 的大图改用 numpy_spring_layout，超过 SPRING_MAX_NODES 时改用 generation_layout，计算量有上限。"""
+    backend = spring_backend(G.number_of_nodes()) if method == "spring" else "generation"
+    if backend != "generation" and G.number_of_nodes() > 0:
+        import networkx as nx
+        if backend == "numpy":
+            raw = numpy_spring_layout(G, seed=42, iterations=50, rules=rules)
+        else:
+            try:
+                raw = nx.spring_layout(G, seed=42, iterations=50)
+            except ImportError:
+                raw = numpy_spring_layout(G, seed=42, iterations=50, rules=rules)
+        scale = 120.0 * math.sqrt(G.number_of_nodes())
+        return {n: (float(x) * scale, float(y) * scale) for n, (x, y) in raw.items()}
+    return generation_layout(G, rules=rules)
+
+def graph_fingerprint(G: nx.DiGraph) -> str:
+    h = hashlib.sha1()
+    for n in G.nodes():
+        h.update(f"n|{n}\n".encode("utf-8"))
+    for u, v, d in G.edges(data=True):
+        h.update(f"e|{u}|{v}|{'|'.join(edge_relations(d))}\n".encode("utf-8"))
+    return h.hexdigest()
+
+# ---------------- render vis html ----------------
+def vis_network_options(accent: str, edge_color: str, layout_fixed: bool) -> dict:
+    """vis.Network 选项（导出页面与实时预览共用）：服务端已给出坐标时关闭物理模拟与动态曲线"""
+    return {
+        "nodes": {"shape": "circularImage", "size": 48, "font": {"size": 14, "color": "#222"}, "borderWidth": 2,
+                  "color": {"border": accent, "background": "#fff"}},
+        "edges": {"color": {"color": edge_color}, "width": 2,
+                  "smooth": False if layout_fixed else {"enabled": True, "type": "dynamic"}, "font": {"align": "middle"}},
+        "interaction": {"hover": True, "navigationButtons": True, "zoomView": True},
+        "physics": {"enabled": False} if layout_fixed else {
+            "enabled": True, "barnesHut": {"gravitationalConstant": -20000, "springLength": 180, "springConstant": 0.01},
+            "stabilization": {"iterations": 250}},
+    }
+
+# 导出页面与实时预览（live_preview.py）共用的前端函数。状态放在 view 对象上：
+# {accent, atlas, atlasSlots, atlasImages, renderer, network}；弹窗内需有 img、h3 与 .bio 元素。
+VIS_SHARED_JS = r"""
+// 头像图集：整张图只解码一次，各节点按偏移从图集中裁切绘制
+function loadAtlas(view) {
+  view.atlasSlots = {};
+  view.atlasImages = view.atlas ? view.atlas.images.map(function(src) {
+    const img = new Image();
+    img.onload = function() { if (view.network) view.network.redraw(); };
+    img.src = src;
+    return img;
+  }) : [];
+  view.renderer = atlasRendererFor(view);
+}
+
+function atlasRendererFor(view) {
+  return function({ ctx, id, x, y, state, style, label }) {
+    const slot = view.atlasSlots[id];
+    const r = style.size || 48;
+    return {
+      drawNode() {
+        const img = view.atlasImages[slot[0]];
+        ctx.beginPath();
+        ctx.arc(x, y, r, 0, 2 * Math.PI);
+        ctx.save();
+        ctx.clip();
+        ctx.fillStyle = '#fff';
+        ctx.fillRect(x - r, y - r, 2 * r, 2 * r);
+        if (img && img.complete && img.naturalWidth) {
+          ctx.drawImage(img, slot[1], slot[2], view.atlas.cell, view.atlas.cell, x - r, y - r, 2 * r, 2 * r);
+        }
+        ctx.restore();
+        ctx.lineWidth = (style.borderWidth || 2) * (state.selected ? 2 : 1);
+        ctx.strokeStyle = style.borderColor || view.accent;
+        ctx.stroke();
+      },
+      drawExternalLabel() {
+        ctx.font = "14px 'Noto Sans SC', 'Microsoft YaHei', Arial, sans-serif";
+        ctx.fillStyle = '#222';
+        ctx.textAlign = 'center';
+        ctx.textBaseline = 'top';
+        ctx.fillText(label || '', x, y + r + 6);
+      },
+      nodeDimensions: { width: 2 * r, height: 2 * r }
+    };
+  };
+}
+
+function prepareNode(view, node) {
+  if (node.atlas) {
+    view.atlasSlots[node.id] = node.atlas;
+    node.shape = 'custom';
+    node.ctxRenderer = view.renderer;
+  }
+  return node;
+}
+
+function atlasCrop(view, slot) {
+  const c = document.createElement('canvas');
+  c.width = c.height = view.atlas.cell;
+  c.getContext('2d').drawImage(view.atlasImages[slot[0]], slot[1], slot[2], view.atlas.cell, view.atlas.cell, 0, 0, view.atlas.cell, view.atlas.cell);
+  return c.toDataURL('image/jpeg', 0.9);
+}
+
+function entranceAnimation(nodes) {
+  try {
+    const ids = nodes.getIds();
+    let i = 0;
+    function step() {
+      if (i >= ids.length) return;
+      const nid = ids[i];
+      const old = nodes.get(nid);
+      if (old) {
+        nodes.update({ id: nid, size: (old.size || 48) * 1.18 });
+        setTimeout(function() { if (nodes.get(nid)) nodes.update({ id: nid, size: (old.size || 48) }); }, 650);
+      }
+      i++;
+      setTimeout(step, 90);
+    }
+    setTimeout(step, 200);
+  } catch (e) { console.warn(e); }
+}
+
+// 点击节点打开人物详情，点击图中空白处或图谱以外的位置关闭；返回解除页面级监听的函数
+function bindDetailModal(view, nodes, modal, container) {
+  view.network.on('click', function(params) {
+    if (params.nodes.length > 0) {
+      const id = params.nodes[0];
+      const node = nodes.get(id);
+      modal.querySelector('img').src = node.full || (view.atlasSlots[id] && view.atlasImages.length ? atlasCrop(view, view.atlasSlots[id]) : (node.image || ''));
+      modal.querySelector('h3').innerText = node.label || id;
+      modal.querySelector('.bio').innerHTML = (node.bio && node.bio.length > 0) ? node.bio.replace(/\n/g, '<br/>').replace(/; /g, '<br/>') : '<i style="color:#888">暂无详细信息</i>';
+      modal.style.display = 'block';
+    } else {
+      modal.style.display = 'none';
+    }
+  });
+  function outside(e) {
+    if (!modal.contains(e.target) && !container.contains(e.target)) {
+      modal.style.display = 'none';
+    }
+  }
+  document.addEventListener('click', outside);
+  return function() { document.removeEventListener('click', outside); };
+}
+"""
+
+VIS_TEMPLATE = """
+<!doctype html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8" />
+<meta name="viewport" content="width=device-width,initial-scale=1" />
+<title>五老精神 动态系谱图</title>
+<style>
+  html,body { height:100%; margin:0; background: __BG__; font-family: 'Noto Sans SC', 'Microsoft YaHei', Arial, sans-serif; color:#222; }
+  #mynetwork { width:100%; height:100%; border-radius:8px; box-shadow: 0 14px 40px rgba(0,0,0,0.12); overflow:hidden; }
+  .modal { position:fixed; right:18px; top:18px; width:360px; max-width:calc(100vw - 32px); background:#fff; padding:14px; border-radius:10px; box-shadow:0 12px 36px rgba(0,0,0,0.14); display:none; z-index:9999; border-left:4px solid __ACCENT__; }
+  .modal img { width:110px; height:110px; border-radius:50%; object-fit:cover; border:4px solid __ACCENT__; box-shadow:0 10px 30px rgba(0,0,0,0.12); }
+  .badge { display:inline-block; padding:4px 8px; margin:4px 4px 0 0; border-radius:10px; background:linear-gradient(90deg, __ACCENT__, __EDGE__); color:#fff; font-size:12px; }
+</style>
+<script src="https://unpkg.com/vis-network@9.1.2/dist/vis-network.min.js"></script>
+</head>
+<body>
+  <div id="mynetwork"></div>
+  <div class="modal" id="modalCard" aria-hidden="true">
+    <div style="text-align:center">
+      <img id="mAvatar" src="" alt="avatar"/>
+      <h3 id="mName" style="margin:12px 0 6px;color:__ACCENT__"></h3>
+    </div>
+    <div id="mBio" class="bio" style="font-size:14px;color:#222;line-height:1.6;max-height:260px;overflow:auto;"></div>
+  </div>
+
+<script>
+__SHARED_JS__
+  const nodesData = __NODES__;
+  const edgesData = __EDGES__;
+  const container = document.getElementById('mynetwork');
+
+  const view = { accent: '__ACCENT__', atlas: __ATLAS__ };
+  loadAtlas(view);
+  nodesData.forEach(function(n) { prepareNode(view, n); });
+
+  const nodes = new vis.DataSet(nodesData);
+  const edges = new vis.DataSet(edgesData);
+  const options = __OPTIONS__;
+  view.network = new vis.Network(container, { nodes: nodes, edges: edges }, options);
+  bindDetailModal(view, nodes, document.getElementById('modalCard'), container);
+
+  if (__ANIMATE__) {
+    if (options.physics.enabled) {
+      view.network.once('stabilizationIterationsDone', function() { entranceAnimation(nodes); });
+    } else {
+      entranceAnimation(nodes);
+    }
+  }
+</script>
+</body>
+</html>
+"""
+
+# 体积大的占位符（节点 / 边 / 图集 JSON 与可能是整张 base64 背景图的 __BG__）不做字符串替换，而是在此处切开、流式写出
+VIS_STREAM_SLOTS = re.compile(r"(__NODES__|__EDGES__|__ATLAS__|__BG__)")
+
+
+def _vis_template_parts(accent: str, edge_color: str, layout_fixed: bool, animate: bool) -> List[str]:
+    """替换小占位符后按大占位符切开的模板片段（占位符本身作为单独的片段保留）"""
+    options = json.dumps(vis_network_options(accent, edge_color, layout_fixed), ensure_ascii=False)
+    template = VIS_TEMPLATE.replace("__SHARED_JS__", VIS_SHARED_JS).replace("__OPTIONS__", options)
+    template = template.replace("__ANIMATE__", "true" if animate else "false")
+    template = template.replace("__ACCENT__", accent).replace("__EDGE__", edge_color)
+    return VIS_STREAM_SLOTS.split(template)
+
+
+def _vis_node(n: str, p: Optional[dict], bio: str, avatar_cache: Optional[AvatarCache], layout, thumb_size, asset_urls, atlas) -> dict:
+    intro = p["intro"] if p else ""
+    avatar_b64 = PLACEHOLDER
+    slot = atlas["slots"].get(p["avatar_path"]) if (atlas and p and p["avatar_path"]) else None
+    if p and p["avatar_path"] and slot is None:
+        with PROFILER.stage("encode_avatar"):
+            if avatar_cache is not None:
+                avatar_b64 = avatar_cache.data_uri(p["avatar_path"], thumb_size or AVATAR_THUMB_SIZES["graph"])
+            else:
+                avatar_b64 = img_to_base64(p["avatar_path"])
+    spirit_tags = p["spirit_tags"] if p else []
+
+    node_color = None
+    if p and p["highlight"]:
+        node_color = {"border": THEME["gold"], "background": "#fff"}
+
+    node = {
+        "id": n,
+        "label": n,
+        "image": avatar_b64,
+        "shape": "circularImage",
+        "title": f"<div style='max-width:260px;font-size:13px;'><b>{n}</b><br>{intro}</div>",
+        "bio": "; ".join(spirit_tags + ([bio] if bio else [])),
+        "color": node_color
+    }
+    if slot is not None:
+        del node["image"]
+        node["atlas"] = list(slot)
+    if asset_urls and n in asset_urls:
+        node["full"] = asset_urls[n]
+    if layout is not None and n in layout:
+        node["x"], node["y"] = round(layout[n][0], 1), round(layout[n][1], 1)
+    return node
+
+
+def _json_array(items: Iterable) -> Iterator[str]:
+    """逐个元素输出 JSON 数组，与 json.dumps(list(items)) 的结果一致"""
+    yield "["
+    for i, item in enumerate(items):
+        yield (", " if i else "") + json.dumps(item, ensure_ascii=False)
+    yield "]"
+
+
+def iter_vis_html(G: nx.Graph, person_index: Dict[str, dict], accent: str, edge_color: str, bg_color: str,
+                  avatar_cache: Optional[AvatarCache] = None,
+                  layout: Optional[Dict[str, Tuple[float, float]]] = None,
+                  animate: bool = True,
+                  thumb_size: Optional[int] = None,
+                  asset_urls: Optional[Dict[str, str]] = None,
+                  atlas: Optional[dict] = None,
+                  bios: Optional[Dict[str, str]] = None,
+                  progress: Optional[Callable[[int, int], None]] = None) -> Iterator[str]:
+    """按片段生成 vis.js 单文件 HTML：模板片段、逐个节点 / 边的 JSON、逐张图集图片依次产出，
+    同一时刻只有一个节点的 JSON 在内存中。参数含义见 render_vis_html；
+    progress(已生成节点数, 节点总数) 每 PROGRESS_EVERY 个节点及结束时调用一次，可在其中抛异常以取消。"""
+    def node_items():
+        total = G.number_of_nodes()
+        for i, n in enumerate(G.nodes(), 1):
+            p = person_index.get(n)
+            bio = bios.get(n, "") if bios is not None else (p["bio"] if p else "")
+            yield _vis_node(n, p, bio, avatar_cache, layout, thumb_size, asset_urls, atlas)
+            if progress and (i % PROGRESS_EVERY == 0 or i == total):
+                progress(i, total)
+
+    def edge_items():
+        for u, v, d in G.edges(data=True):
+            yield {"from": u, "to": v, "label": d.get("label",""), "arrows": "to"}
+
+    for part in _vis_template_parts(accent, edge_color, layout is not None, animate):
+        if part == "__NODES__":
+            yield from _json_array(node_items())
+        elif part == "__EDGES__":
+            yield from _json_array(edge_items())
+        elif part == "__ATLAS__":
+            if atlas:
+                yield '{"images": '
+                yield from _json_array(atlas["images"])
+                yield f', "cell": {json.dumps(atlas["cell"])}}}'
+            else:
+                yield "null"
+        elif part == "__BG__":
+            yield bg_color
+        else:
+            yield part
+
+
+def render_vis_html(G: nx.Graph, person_index: Dict[str, dict], accent: str, edge_color: str, bg_color: str,
+                    avatar_cache: Optional[AvatarCache] = None,
+                    layout: Optional[Dict[str, Tuple[float, float]]] = None,
+                    animate: bool = True,
+                    thumb_size: Optional[int] = None,
+                    asset_urls: Optional[Dict[str, str]] = None,
+                    atlas: Optional[dict] = None,
+                    bios: Optional[Dict[str, str]] = None) -> str:
+    """生成 vis.js 单文件 HTML。传入 layout 时输出固定的 x/y 并关闭物理模拟；animate=False 时跳过入场动画。
+    thumb_size 指定节点内联缩略图尺寸；asset_urls (人物 -> 相对地址) 给出时，详情弹窗打开后才加载该地址的头像原图。
+    atlas 为 AvatarCache.pack_atlas 的结果，给出时节点头像从图集中按偏移绘制，不再逐个内联图片。
+    bios (人物 -> 生平) 给出时代替人物索引中的 bio（SQLite 后端只在生成 HTML 时按需读取生平）。
+    导出到文件时用 write_vis_html 流式写出，避免整份 HTML 驻留内存。"""
+    with PROFILER.stage("render_vis_html"):
+        html = "".join(iter_vis_html(G, person_index, accent, edge_color, bg_color, avatar_cache=avatar_cache, layout=layout,
+                                     animate=animate, thumb_size=thumb_size, asset_urls=asset_urls, atlas=atlas, bios=bios))
+    if PROFILER.enabled:
+        PROFILER.size("vis_html", len(html.encode("utf-8")))
+    return html
+
+
+def write_vis_html(fp: BinaryIO, G: nx.Graph, person_index: Dict[str, dict], accent: str, edge_color: str, bg_color: str,
+                   **render_kwargs) -> int:
+    """把 HTML 按片段编码后写入二进制文件对象（磁盘文件、zip 成员或 BytesIO），返回写入的字节数"""
+    written = 0
+    with PROFILER.stage("write_vis_html"):
+        for chunk in iter_vis_html(G, person_index, accent, edge_color, bg_color, **render_kwargs):
+            data = chunk.encode("utf-8")
+            fp.write(data)
+            written += len(data)
+    PROFILER.size("vis_html", written)
+    return written
+
+class _ByteCounter:
+    """只计数不保存的二进制文件对象，用于测量 HTML 体积"""
+
+    def __init__(self):
+        self.written = 0
+
+    def write(self, data: bytes) -> int:
+        self.written += len(data)
+        return len(data)
+
+def utf8_size(text: str) -> int:
+    """字符串 UTF-8 编码后的字节数（分块编码，不生成整份副本）"""
+    return sum(len(text[i:i + EXPORT_CHUNK_CHARS].encode("utf-8")) for i in range(0, len(text), EXPORT_CHUNK_CHARS))
+
+# ---------------- live preview diffs ----------------
+@PROFILER.timed("vis_items")
+def vis_items(G: nx.Graph, person_index: Dict[str, dict],
+              avatar_cache: Optional[AvatarCache] = None,
+              layout: Optional[Dict[str, Tuple[float, float]]] = None,
+              thumb_size: Optional[int] = None,
+              atlas: Optional[dict] = None,
+              bios: Optional[Dict[str, str]] = None) -> Tuple[Dict[str, dict], Dict[str, dict]]:
+    """图中节点与边的 vis DataSet 条目：({节点 id: 节点}, {边 id: 边})，节点内容与 render_vis_html 输出的一致。
+    边以 "起点→终点" 作稳定 id，便于增量更新时定位。"""
+    nodes = {}
+    for n in G.nodes():
+        p = person_index.get(n)
+        bio = bios.get(n, "") if bios is not None else (p["bio"] if p else "")
+        nodes[n] = _vis_node(n, p, bio, avatar_cache, layout, thumb_size, None, atlas)
+    edges = {}
+    for u, v, d in G.edges(data=True):
+        eid = f"{u}\u2192{v}"
+        edges[eid] = {"id": eid, "from": u, "to": v, "label": d.get("label",""), "arrows": "to"}
+    return nodes, edges
+
+def _items_size(items: Tuple[Dict[str, dict], Dict[str, dict]]) -> int:
+    """vis_items 结果的估算内存（头像 data URI 通常与 AvatarCache 共用同一字符串，这里仍计入，宁可高估）"""
+    nodes, edges = items
+    return sum(len(n.get("image", "")) + len(n["bio"]) + len(n["title"]) + 300 for n in nodes.values()) + 200 * len(edges)
+
+
+def _graph_size(G: nx.Graph) -> int:
+    """子图的估算内存（networkx 每个节点 / 边约几百字节的 dict 开销）"""
+    return 400 * (G.number_of_nodes() + G.number_of_edges())
+
+
+def diff_vis_items(old: Dict[str, dict], new: Dict[str, dict]) -> dict:
+    """两次渲染之间的 DataSet 差异：{"add": [条目], "update": [条目], "remove": [id]}"""
+    return {
+        "add": [item for k, item in new.items() if k not in old],
+        "update": [item for k, item in new.items() if k in old and old[k] != item],
+        "remove": [k for k in old if k not in new],
+    }
+
+# ---------------- export ----------------
+def collect_avatar_assets(G: nx.Graph, person_index: Dict[str, dict], prefix: str = "assets") -> Tuple[Dict[str, str], Dict[str, Path]]:
+    """收集图中人物的头像原图，按文件内容哈希去重。
+    返回 (人物 -> 相对地址, 相对地址 -> 源文件)。"""
+    urls: Dict[str, str] = {}
+    files: Dict[str, Path] = {}
+    digests: Dict[str, str] = {}
+    for n in G.nodes():
+        p = person_index.get(n)
+        if not p or not p["avatar_path"]:
+            continue
+        src = Path(p["avatar_path"])
+        key = str(src)
+        if key not in digests:
+            try:
+                digests[key] = file_digest(src)
+            except OSError:
+                continue
+        rel = f"{prefix}/{digests[key]}.jpg"
+        urls[n] = rel
+        files[rel] = src
+    return urls, files
+
+@PROFILER.timed("export_lazy_bundle")
+def export_lazy_bundle(G: nx.Graph, person_index: Dict[str, dict], out_zip: Path, html_name: str = "genealogy_export.html",
+                       progress: Optional[Callable[[int, int], None]] = None, inline_bytes: Optional[int] = None,
+                       **render_kwargs) -> dict:
+    """导出轻量包：HTML 只内联占位小图，头像按详情弹窗尺寸缩放、去重后放进 zip 的 assets/ 目录，弹窗打开时再加载。
+    HTML 直接流式写入 zip 成员。返回各部分字节数，inline_html_bytes 为同参数单文件 HTML 的体积，便于对比：
+    调用方已知时经 inline_bytes 传入，否则在打包后按单文件模式再渲染一遍只计字节数。
+    progress(已完成, 总数) 依次覆盖节点、头像与（需要时）单文件体积测量。"""
+    avatar_cache = render_kwargs.get("avatar_cache")
+    urls, files = collect_avatar_assets(G, person_index)
+    packed = G.number_of_nodes() + len(files)
+    total = packed + (G.number_of_nodes() if inline_bytes is None else 0)
+    out_zip.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_zip.with_suffix(".tmp")
+    assets_bytes = 0
+    try:
+        with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            with zf.open(html_name, "w", force_zip64=True) as fh:
+                html_bytes = write_vis_html(fh, G, person_index, thumb_size=AVATAR_THUMB_SIZES["inline"], asset_urls=urls,
+                                            progress=(lambda done, _: progress(done, total)) if progress else None,
+                                            **render_kwargs)
+            for i, (rel, src) in enumerate(files.items(), 1):
+                data = avatar_cache.thumbnail_bytes(str(src), AVATAR_THUMB_SIZES["detail"]) if avatar_cache else None
+                if data is None:
+                    data = src.read_bytes()
+                # JPEG 本身已压缩，直接存储
+                zf.writestr(rel, data, compress_type=zipfile.ZIP_STORED)
+                assets_bytes += len(data)
+                if progress:
+                    progress(G.number_of_nodes() + i, total)
+        if inline_bytes is None:
+            inline_bytes = write_vis_html(_ByteCounter(), G, person_index,
+                                          progress=(lambda done, _: progress(packed + done, total)) if progress else None,
+                                          **render_kwargs)
+        os.replace(tmp, out_zip)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    sizes = {"html_bytes": html_bytes, "assets_bytes": assets_bytes, "assets": len(files), "zip_bytes": out_zip.stat().st_size,
+             "inline_html_bytes": inline_bytes}
+    PROFILER.size("bundle_assets", assets_bytes)
+    PROFILER.size("bundle_zip", sizes["zip_bytes"])
+    return sizes
+
+def format_size(n: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+# ---------------- cached data pipeline ----------------
+def dir_fingerprint(path: Path) -> str:
+    """目录指纹：文件名 + 大小 + mtime（头像内容哈希由 AvatarCache 负责）"""
+    h = hashlib.sha1()
+    if path.exists():
+        for e in sorted(os.scandir(path), key=lambda e: e.name):
+            if e.is_file():
+                st_ = e.stat()
+                h.update(f"{e.name}|{st_.st_size}|{st_.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+class DataPipeline:
+    """带指纹缓存的数据流水线：safe_read_csv -> parse_relations / build_person_index -> build_graph -> render_vis_html。
+
+    persons.csv、relations.csv 以 (大小, mtime, sha1) 作指纹，头像目录以文件列表 + 大小 + mtime 作指纹；
+    输入不变时直接复用上次解析出的三元组、图与渲染好的 HTML，只有变化的阶段才会重建。
+    服务端布局坐标按图指纹缓存在内存，并在提供 cache_dir 时落盘（cache_dir/layouts/*.json）。
+    渲染好的 HTML、实时预览条目、视图子图、布局与图集放在同一个 SharedCache 里，共用 cache_max_bytes 的内存预算；
+    实例通常为进程级（app.py 用 st.cache_resource），多个会话同时未命中同一项时只计算一次，数据变化时整体失效。
+    提供 store（store.GenealogyStore）时以 SQLite 为数据源：CSV 变化时增量同步进库，指纹改用库内各表的版本号，
+    人物索引不含生平，生成 HTML 或打开详情时再按姓名从库中读取。
+    精神标签在人物阶段由 tagger 对全部生平批量识别一次，结果随人物索引缓存（库中随人物行保存）。
+    世系查询与代际分层按 relation_rules 判断长幼方向，规则变化时关系阶段与布局缓存随之失效。
+    """
+
+    def __init__(self, data_dir: Path, avatar_dir: Path, avatar_cache: Optional[AvatarCache] = None,
+                 cache_max_bytes: int = 256 << 20, cache_dir: Optional[Path] = None, store=None,
+                 tagger: Optional[SpiritTagger] = None, relation_rules: Optional[RelationRules] = None):
+        self.data_dir = Path(data_dir)
+        self.avatar_dir = Path(avatar_dir)
+        self.avatar_cache = avatar_cache
+        self.layout_dir = Path(cache_dir) / "layouts" if cache_dir else None
+        self.store = store
+        self.tagger = tagger or SPIRIT_TAGGER
+        self.relation_rules = relation_rules or RELATION_RULES
+        self._lock = threading.Lock()
+        self._digests: Dict[str, Tuple[int, int, str]] = {}
+        self._persons = None     # (key, persons_df, person_index, spirit_counts)
+        self._relations = None   # (key, relations_df, triples, G, relation_report, graph_index)
+        # 派生结果，键的首项区分种类：html / items（实时预览的 nodes, edges）/ view（子图）/ layout / atlas
+        self._cache = SharedCache(cache_max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.last_rebuild_ms = 0.0   # load() 最近一次重建数据阶段的耗时
+        self.last_render_ms = 0.0    # 最近一次渲染 HTML 的耗时（导出线程也会更新，写入时持有 self._lock）
+
+    def file_fingerprint(self, path: Path) -> tuple:
+        try:
+            st_ = path.stat()
+        except OSError:
+            return (path.name, None)
+        known = self._digests.get(str(path))
+        if not (known and known[0] == st_.st_size and known[1] == st_.st_mtime_ns):
+            known = (st_.st_size, st_.st_mtime_ns, file_digest(path))
+            self._digests[str(path)] = known
+        return (path.name,) + known
+
+    def input_key(self) -> tuple:
+        """(persons.csv + 头像目录指纹, relations.csv 指纹)，不读取数据即可判断输入是否变化；
+        SQLite 后端先把变化的 CSV 同步进库，再以 (库实例 id, 库内版本号) 作指纹"""
+        persons_fp = self.file_fingerprint(self.data_dir / "persons.csv")
+        relations_fp = self.file_fingerprint(self.data_dir / "relations.csv")
+        rules = self.relation_rules.fingerprint
+        if self.store is None:
+            return (persons_fp, dir_fingerprint(self.avatar_dir), self.tagger.fingerprint), (relations_fp, rules)
+        self.sync_store(persons_fp, relations_fp)
+        instance = self.store.instance_id
+        return ((("store", instance, self.store.version("persons")), dir_fingerprint(self.avatar_dir)),
+                ("store", instance, self.store.version("relations"), rules))
+
+    @PROFILER.timed("store_sync")
+    def sync_store(self, persons_fp: tuple, relations_fp: tuple):
+        """CSV 指纹与上次导入时不同才导入；导入本身只写入有变化的行。标签配置变化时整库重新打标签"""
+        if self.store.get_meta("tagger") != self.tagger.fingerprint:
+            self.store.retag(self.tagger)
+        if persons_fp[1] is not None and self.store.get_meta("csv:persons") != repr(persons_fp):
+            self.store.import_persons_csv(self.data_dir / "persons.csv", self.tagger)
+            self.store.set_meta("csv:persons", repr(persons_fp))
+        if relations_fp[1] is not None and self.store.get_meta("csv:relations") != repr(relations_fp):
+            self.store.import_relations_csv(self.data_dir / "relations.csv")
+            self.store.set_meta("csv:relations", repr(relations_fp))
+
+    def bio(self, data: dict, name: str) -> str:
+        """人物生平（SQLite 后端按需从库中读取）"""
+        if self.store is not None:
+            return self.store.bio(name)
+        p = data["person_index"].get(name)
+        return p["bio"] if p else ""
+
+    def _bios(self, G: nx.Graph) -> Optional[Dict[str, str]]:
+        return self.store.bios(G.nodes()) if self.store is not None else None
+
+    def load(self) -> dict:
+        """返回 {persons, relations, triples, graph, graph_index, relation_report, person_index, spirit_counts, key}，
+        未变化的阶段直接命中缓存"""
+        with self._lock, PROFILER.stage("pipeline_load"):
+            t0 = time.perf_counter()
+            rebuilt = False
+            persons_key, relations_key = self.input_key()
+            if self._persons and self._persons[0] == persons_key:
+                self.hits += 1
+            else:
+                self.misses += 1
+                rebuilt = True
+                persons = self.store.persons_frame() if self.store is not None else safe_read_csv(self.data_dir / "persons.csv")
+                search_dirs = (self.avatar_dir, self.data_dir, self.data_dir.parent)
+                index = build_person_index(persons, search_dirs, self.tagger)
+                counts = self.tagger.counts(p["spirit_tags"] for p in index.values())
+                self._persons = (persons_key, persons, index, counts)
+
+            if self._relations and self._relations[0] == relations_key:
+                self.hits += 1
+            else:
+                self.misses += 1
+                rebuilt = True
+                if self.store is not None:
+                    import pandas as pd
+                    triples = self.store.triples()
+                    relations = pd.DataFrame([(s, t, r) for s, r, t in triples], columns=["source", "target", "relation"])
+                    report = self.store.relation_report()
+                else:
+                    relations = safe_read_csv(self.data_dir / "relations.csv")
+                    triples, report = parse_relations_with_report(relations)
+                G = build_graph(triples)
+                self._relations = (relations_key, relations, triples, G, report, GraphIndex(G, self.relation_rules))
+
+            if rebuilt:
+                self._cache.clear()
+                self.last_rebuild_ms = (time.perf_counter() - t0) * 1000
+            return {
+                "key": (persons_key, relations_key),
+                "persons": self._persons[1],
+                "person_index": self._persons[2],
+                "spirit_counts": self._persons[3],
+                "relations": self._relations[1],
+                "triples": self._relations[2],
+                "graph": self._relations[3],
+                "relation_report": self._relations[4],
+                "graph_index": self._relations[5],
+            }
+
+    def view(self, data: dict, mode: str = "all", center: str = "", k: int = 1, up: int = 1, down: int = 1,
+             relation: Optional[str] = None) -> dict:
+        """按视图取子图：all 全图 / ego 以 center 为中心 k 跳 / lineage 上下 up、down 代；relation 只保留该类型的关系。
+        返回与 load() 结构相同的 dict（graph 替换为子图，key 附带视图参数），可直接交给 render / export。"""
+        if mode == "all" and not relation:
+            return data
+        gi: GraphIndex = data["graph_index"]
+        if mode == "ego":
+            nodes = gi.ego(center, k, relation)
+        elif mode == "lineage":
+            nodes = gi.lineage(center, up, down, relation)
+        else:
+            nodes = gi.with_relation(relation)
+        view_key = (mode, center, k, up, down, relation)
+        H = self._shared(("view", data["key"], view_key), lambda: gi.subgraph(nodes, relation), _graph_size)
+        return dict(data, graph=H, key=(data["key"], view_key))
+
+    def layout(self, G: nx.DiGraph, method: str) -> Dict[str, Tuple[float, float]]:
+        """按 (图指纹, 方向规则, 布局方法) 缓存服务端布局坐标"""
+        fp = f"{graph_fingerprint(G)}_{self.relation_rules.fingerprint}"
+
+        def build():
+            disk = self.layout_dir / f"{fp}_{method}.json" if self.layout_dir else None
+            if disk is not None and disk.exists():
+                try:
+                    return {n: tuple(xy) for n, xy in json.loads(disk.read_text(encoding="utf-8")).items()}
+                except Exception:
+                    pass
+            pos = compute_layout(G, method, self.relation_rules)
+            if disk is not None:
+                disk.parent.mkdir(parents=True, exist_ok=True)
+                tmp = disk.with_suffix(".tmp")
+                tmp.write_text(json.dumps(pos, ensure_ascii=False), encoding="utf-8")
+                os.replace(tmp, disk)
+            return pos
+        return self._shared(("layout", fp, method), build, lambda pos: 120 * len(pos))
+
+    def atlas(self, data: dict) -> Optional[dict]:
+        """图中人物头像打包成的图集，数据不变时复用"""
+        if self.avatar_cache is None:
+            return None
+        G, person_index = data["graph"], data["person_index"]
+
+        def build():
+            paths = [person_index[n]["avatar_path"] for n in G.nodes() if n in person_index and person_index[n]["avatar_path"]]
+            with PROFILER.stage("pack_atlas"):
+                return self.avatar_cache.pack_atlas(paths, cell=AVATAR_THUMB_SIZES["graph"])
+        return self._shared(("atlas", data["key"]), build,
+                            lambda atlas: sum(map(len, atlas["images"])) + 100 * len(atlas["slots"]))
+
+    def render(self, data: dict, accent: str, edge_color: str, bg_color: str,
+               layout: str = "physics", animate_max_nodes: int = ANIMATION_MAX_NODES, use_atlas: bool = False) -> str:
+        """按 (数据指纹, 主题, 背景, 布局, 动画, 图集) 缓存 render_vis_html 的结果"""
+        key = self._render_key(data, accent, edge_color, bg_color, layout, animate_max_nodes, use_atlas)
+
+        def build():
+            t0 = time.perf_counter()
+            html = render_vis_html(data["graph"], data["person_index"], accent=accent, edge_color=edge_color, bg_color=bg_color,
+                                   **self._render_kwargs(data, layout, animate_max_nodes, use_atlas))
+            elapsed = (time.perf_counter() - t0) * 1000
+            with self._lock:
+                self.last_render_ms = elapsed
+            return html
+        return self._shared(("html",) + key, build, len)
+
+    def items(self, data: dict, layout: str = "physics", use_atlas: bool = False) -> Tuple[Dict[str, dict], Dict[str, dict]]:
+        """实时预览用的 vis DataSet 条目（见 vis_items），按 (数据指纹, 布局, 图集) 缓存"""
+        def build():
+            kwargs = self._render_kwargs(data, layout, 0, use_atlas)
+            del kwargs["animate"]
+            return vis_items(data["graph"], data["person_index"], **kwargs)
+        return self._shared(("items", data["key"], layout, use_atlas), build, _items_size)
+
+    def _shared(self, key: tuple, build: Callable[[], object], sizeof: Callable[[object], int]):
+        """经共享缓存取值：本线程实际计算时计入未命中；命中或等到其他会话正在进行的同一计算时计入命中"""
+        built = []
+
+        def factory():
+            built.append(True)
+            return build()
+        value = self._cache.get_or_create(key, factory, sizeof)
+        with self._lock:
+            if built:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def _render_key(self, data: dict, accent: str, edge_color: str, bg_color: str,
+                    layout: str, animate_max_nodes: int, use_atlas: bool) -> tuple:
+        animate = data["graph"].number_of_nodes() <= animate_max_nodes
+        bg_key = hashlib.sha1(bg_color.encode("utf-8")).hexdigest()
+        return (data["key"], accent, edge_color, bg_key, layout, animate, use_atlas)
+
+    def _render_kwargs(self, data: dict, layout: str, animate_max_nodes: int, use_atlas: bool) -> dict:
+        G = data["graph"]
+        return {"avatar_cache": self.avatar_cache,
+                "layout": self.layout(G, layout) if layout != "physics" else None,
+                "animate": G.number_of_nodes() <= animate_max_nodes,
+                "atlas": self.atlas(data) if use_atlas else None,
+                "bios": self._bios(G)}
+
+    def export(self, data: dict, out_dir: Path, mode: str = "inline", bg_color: str = THEME["bg"],
+               layout: str = "physics", animate_max_nodes: int = ANIMATION_MAX_NODES, use_atlas: bool = False,
+               progress: Optional[Callable[[int, int], None]] = None) -> dict:
+        """导出到 out_dir：inline 写 genealogy_export.html，lazy 写 genealogy_export_bundle.zip。
+        HTML 流式写盘（已有同参数的预览渲染结果时直接写出该结果），不在内存中拼出整份文件。
+        progress 见 iter_vis_html / export_lazy_bundle。
+        返回 {"path": 输出文件, "html_bytes": ...}，lazy 模式另含 assets / assets_bytes / zip_bytes / inline_html_bytes
+        （单文件模式的 HTML 体积；已有同参数的预览渲染结果时直接取其长度）。"""
+        G = data["graph"]
+        accent, edge_color = THEME["gold"], THEME["edge"]
+        key = self._render_key(data, accent, edge_color, bg_color, layout, animate_max_nodes, use_atlas)
+        cached = self._cache.get(("html",) + key)
+        if mode == "inline":
+            out = Path(out_dir) / "genealogy_export.html"
+            with atomic_open(out) as fh:
+                if cached is not None:
+                    written = 0
+                    for i in range(0, len(cached), EXPORT_CHUNK_CHARS):
+                        written += fh.write(cached[i:i + EXPORT_CHUNK_CHARS].encode("utf-8"))
+                else:
+                    written = write_vis_html(fh, G, data["person_index"], accent, edge_color, bg_color, progress=progress,
+                                             **self._render_kwargs(data, layout, animate_max_nodes, use_atlas))
+            return {"path": out, "html_bytes": written}
+        out = Path(out_dir) / "genealogy_export_bundle.zip"
+        sizes = export_lazy_bundle(G, data["person_index"], out, accent=accent, edge_color=edge_color, bg_color=bg_color,
+                                   progress=progress, inline_bytes=utf8_size(cached) if cached is not None else None,
+                                   **self._render_kwargs(data, layout, animate_max_nodes, use_atlas))
+        sizes["path"] = out
+        return sizes
+
+    def stats(self) -> dict:
+        shared = self._cache.stats()
+        return {"hits": self.hits, "misses": self.misses,
+                "last_rebuild_ms": self.last_rebuild_ms, "last_render_ms": self.last_render_ms,
+                "cache_entries": shared["entries"], "cache_bytes": shared["bytes"], "cache_max_bytes": shared["max_bytes"],
+                "coalesced": shared["coalesced"], "evictions": shared["evictions"]}
@@ -0,0 +1,146 @@
+# live_preview.py — 互动图谱实时预览（常驻页面的组件，rerun 之间只下发节点 / 边的增量）
+import json
+
+import streamlit as st
+
+from genealogy import ANIMATION_MAX_NODES, VIS_SHARED_JS, DataPipeline, diff_vis_items, vis_network_options
+from profiling import PROFILER
+
+PREVIEW_HEIGHT = 720
+
+LIVE_CSS = """
+.gl-wrap { position:relative; width:100%; border-radius:8px; box-shadow:0 14px 40px rgba(0,0,0,0.12); overflow:hidden; background-size:cover; background-position:center; }
+.gl-net { width:100%; height:100%; }
+.gl-modal { position:absolute; right:18px; top:18px; width:360px; max-width:calc(100% - 32px); background:#fff; padding:14px; border-radius:10px; box-shadow:0 12px 36px rgba(0,0,0,0.14); display:none; z-index:10; border-left:4px solid var(--gl-accent); font-family:'Noto Sans SC', 'Microsoft YaHei', Arial, sans-serif; }
+.gl-modal img { display:block; margin:0 auto; width:110px; height:110px; border-radius:50%; object-fit:cover; border:4px solid var(--gl-accent); box-shadow:0 10px 30px rgba(0,0,0,0.12); }
+.gl-modal h3 { margin:12px 0 6px; text-align:center; color:var(--gl-accent); }
+.gl-modal .bio { font-size:14px; color:#222; line-height:1.6; max-height:260px; overflow:auto; }
+"""
+
+# 组件函数在挂载及每次 data 变化时被调用，parentElement 在 rerun 之间保持不变：
+# 网络对象挂在 parentElement 上，reset 载荷重建网络，增量载荷（base 与当前 rev 一致时）走 DataSet.update / remove，
+# 节点位置与缩放不变；rev 对不上（例如组件被重新挂载）时通过 resync 状态请求服务端下发完整载荷。
+# 图集绘制、入场动画与详情弹窗沿用导出页面的 VIS_SHARED_JS，vis.Network 选项由服务端 vis_network_options 生成。
+LIVE_JS = VIS_SHARED_JS + r"""
+const VIS_URL = "https://unpkg.com/vis-network@9.1.2/dist/vis-network.min.js";
+
+function loadVis() {
+  if (window.vis && window.vis.Network) return Promise.resolve();
+  if (!window.__glVisLoading) {
+    window.__glVisLoading = new Promise(function(resolve, reject) {
+      const s = document.createElement('script');
+      s.src = VIS_URL;
+      s.onload = resolve;
+      s.onerror = reject;
+      document.head.appendChild(s);
+    });
+  }
+  return window.__glVisLoading;
+}
+
+function destroy(view) {
+  view.unbindModal();
+  view.network.destroy();
+  view.wrap.remove();
+}
+
+function build(root, data) {
+  const o = data.options;
+  if (root.__gl) destroy(root.__gl);
+  const wrap = document.createElement('div');
+  wrap.className = 'gl-wrap';
+  wrap.style.height = o.height + 'px';
+  wrap.style.background = o.bg;
+  wrap.style.backgroundSize = 'cover';
+  wrap.style.setProperty('--gl-accent', o.accent);
+  wrap.innerHTML = '<div class="gl-net"></div>' +
+    '<div class="gl-modal"><img alt="avatar"/><h3></h3><div class="bio"></div></div>';
+  root.appendChild(wrap);
+
+  const view = { rev: data.rev, wrap: wrap, accent: o.accent, atlas: o.atlas };
+  loadAtlas(view);
+  view.nodes = new vis.DataSet(data.nodes.map(function(n) { return prepareNode(view, n); }));
+  view.edges = new vis.DataSet(data.edges);
+  const net = wrap.querySelector('.gl-net');
+  view.network = new vis.Network(net, { nodes: view.nodes, edges: view.edges }, o.network);
+  view.unbindModal = bindDetailModal(view, view.nodes, wrap.querySelector('.gl-modal'), net);
+
+  if (data.animate) {
+    if (o.network.physics.enabled) {
+      view.network.once('stabilizationIterationsDone', function() { entranceAnimation(view.nodes); });
+    } else {
+      entranceAnimation(view.nodes);
+    }
+  }
+  root.__gl = view;
+}
+
+function apply(view, data) {
+  view.edges.remove(data.edges.remove);
+  view.nodes.remove(data.nodes.remove);
+  data.nodes.remove.forEach(function(id) { delete view.atlasSlots[id]; });
+  view.nodes.update(data.nodes.add.concat(data.nodes.update).map(function(n) { return prepareNode(view, n); }));
+  view.edges.update(data.edges.add.concat(data.edges.update));
+  view.rev = data.rev;
+}
+
+export default async function(component) {
+  const { data, parentElement, setStateValue } = component;
+  const root = parentElement;
+  const cleanup = function() {
+    if (root.__gl) { destroy(root.__gl); root.__gl = null; }
+  };
+  if (!data) return cleanup;
+  await loadVis();
+  const view = root.__gl;
+  if (view && view.rev === data.rev) {
+    // 没有变化时服务端原样重发上次的载荷
+  } else if (data.reset) {
+    build(root, data);
+  } else if (view && view.rev === data.base) {
+    apply(view, data);
+  } else {
+    setStateValue('resync', data.rev);
+  }
+  return cleanup;
+}
+"""
+
+_LIVE_COMPONENT = st.components.v2.component("genealogy_live_preview", css=LIVE_CSS, js=LIVE_JS, isolate_styles=False)
+
+
+def live_preview(pipeline: DataPipeline, view: dict, accent: str, edge_color: str, bg_color: str,
+                 layout: str = "physics", animate_max_nodes: int = ANIMATION_MAX_NODES, use_atlas: bool = False,
+                 key: str = "live_preview", height: int = PREVIEW_HEIGHT) -> dict:
+    """挂载实时预览。与本会话上次下发的节点 / 边比对：主题、背景、布局方式或图集变化时下发完整载荷（重建网络），
+    否则只下发增量（没有变化时原样重发上次的载荷，前端据 rev 忽略）。返回 {"rev", "reset", "added", "updated", "removed"}。"""
+    nodes, edges = pipeline.items(view, layout, use_atlas)
+    atlas = pipeline.atlas(view) if use_atlas else None
+    options = {"accent": accent, "bg": bg_color, "height": height,
+               "network": vis_network_options(accent, edge_color, layout != "physics"),
+               "atlas": {"images": atlas["images"], "cell": atlas["cell"]} if atlas else None}
+    sync = st.session_state.setdefault(f"{key}_sync", {"rev": 0, "payload": None, "options": None, "nodes": {}, "edges": {},
+                                                       "force": False, "stats": {}})
+    rev = sync["rev"]
+    if sync["force"] or sync["payload"] is None or sync["options"] != options:
+        sync["rev"] += 1
+        sync["payload"] = {"rev": sync["rev"], "reset": True, "options": options,
+                           "animate": len(nodes) <= animate_max_nodes,
+                           "nodes": list(nodes.values()), "edges": list(edges.values())}
+        sync["stats"] = {"rev": sync["rev"], "reset": True, "added": len(nodes), "updated": 0, "removed": 0}
+    elif nodes is not sync["nodes"] or edges is not sync["edges"]:
+        with PROFILER.stage("live_diff"):
+            dn = diff_vis_items(sync["nodes"], nodes)
+            de = diff_vis_items(sync["edges"], edges)
+        if any(dn.values()) or any(de.values()):
+            sync["rev"] += 1
+            sync["payload"] = {"rev": sync["rev"], "base": sync["rev"] - 1, "reset": False, "nodes": dn, "edges": de}
+            sync["stats"] = {"rev": sync["rev"], "reset": False,
+                             "added": len(dn["add"]) + len(de["add"]), "updated": len(dn["update"]) + len(de["update"]),
+                             "removed": len(dn["remove"]) + len(de["remove"])}
+    sync.update(force=False, options=options, nodes=nodes, edges=edges)
+    if PROFILER.enabled and sync["rev"] != rev:
+        PROFILER.size("live_reset" if sync["payload"]["reset"] else "live_diff",
+                      len(json.dumps(sync["payload"], ensure_ascii=False).encode("utf-8")))
+    _LIVE_COMPONENT(data=sync["payload"], key=key, on_resync_change=lambda: sync.update(force=True))
+    return sync["stats"]
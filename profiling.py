@@ -0,0 +1,111 @@
+# profiling.py — 可选的各阶段耗时与载荷体积统计（进程级，默认关闭；关闭时每个埋点只多一次属性判断）
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List
+
+_NULL = nullcontext()
+
+
+class Profiler:
+    """stage(name) / timed(name) 记录耗时，size(name, n) 记录载荷字节数；每项累计 调用次数 / 总量 / 最大值 / 最近一次。
+    导出线程与各会话共用同一个实例，记录时加锁。"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.since = time.time()
+        self._lock = threading.Lock()
+        self._stages: Dict[str, List[float]] = {}   # name -> [count, 秒数合计, 最大, 最近]
+        self._sizes: Dict[str, List[float]] = {}    # name -> [count, 字节合计, 最大, 最近]
+
+    def stage(self, name: str):
+        """with PROFILER.stage("name"): ... ；关闭时返回空的上下文管理器"""
+        return self._timer(name) if self.enabled else _NULL
+
+    @contextmanager
+    def _timer(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(self._stages, name, time.perf_counter() - t0)
+
+    def timed(self, name: str) -> Callable:
+        """函数装饰器版的 stage"""
+        def deco(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with self._timer(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return deco
+
+    def size(self, name: str, nbytes: int):
+        if self.enabled:
+            self._add(self._sizes, name, nbytes)
+
+    def _add(self, table: Dict[str, List[float]], name: str, value: float):
+        with self._lock:
+            row = table.get(name)
+            if row is None:
+                table[name] = [1, value, value, value]
+            else:
+                row[0] += 1
+                row[1] += value
+                row[2] = max(row[2], value)
+                row[3] = value
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._sizes.clear()
+            self.since = time.time()
+
+    def snapshot(self) -> dict:
+        """{"since", "stages": {name: {count, total_ms, mean_ms, max_ms, last_ms}}, "sizes": {name: {count, total_bytes, max_bytes, last_bytes}}}"""
+        with self._lock:
+            stages = {k: list(v) for k, v in self._stages.items()}
+            sizes = {k: list(v) for k, v in self._sizes.items()}
+        return {
+            "since": self.since,
+            "stages": {k: {"count": int(c), "total_ms": t * 1000, "mean_ms": t * 1000 / c, "max_ms": m * 1000, "last_ms": last * 1000}
+                       for k, (c, t, m, last) in sorted(stages.items())},
+            "sizes": {k: {"count": int(c), "total_bytes": int(t), "max_bytes": int(m), "last_bytes": int(last)}
+                      for k, (c, t, m, last) in sorted(sizes.items())},
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix: str = "genealogy") -> str:
+        """Prometheus 文本格式（计数与合计为 counter，最大 / 最近一次为 gauge）"""
+        snap = self.snapshot()
+        metrics = (
+            ("stage_calls_total", "counter", "stages", "count", 1, "阶段调用次数"),
+            ("stage_seconds_total", "counter", "stages", "total_ms", 1e-3, "阶段累计耗时（秒）"),
+            ("stage_seconds_max", "gauge", "stages", "max_ms", 1e-3, "阶段单次最长耗时（秒）"),
+            ("stage_seconds_last", "gauge", "stages", "last_ms", 1e-3, "阶段最近一次耗时（秒）"),
+            ("payload_bytes_total", "counter", "sizes", "total_bytes", 1, "载荷累计字节数"),
+            ("payload_bytes_max", "gauge", "sizes", "max_bytes", 1, "载荷单次最大字节数"),
+            ("payload_bytes_last", "gauge", "sizes", "last_bytes", 1, "载荷最近一次字节数"),
+        )
+        lines = []
+        for metric, kind, table, field, scale, help_ in metrics:
+            if not snap[table]:
+                continue
+            name = f"{prefix}_{metric}"
+            label = "stage" if table == "stages" else "payload"
+            lines.append(f"# HELP {name} {help_}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, row in snap[table].items():
+                lines.append(f'{name}{{{label}="{key}"}} {row[field] * scale:.6g}')
+        return "\n".join(lines) + "\n"
+
+
+# 设置环境变量 GENEALOGY_PROFILE=1 时从进程启动起即开启（首次加载的耗时也会记录）
+PROFILER = Profiler(enabled=os.environ.get("GENEALOGY_PROFILE", "") not in ("", "0"))
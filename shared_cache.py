@@ -0,0 +1,108 @@
+# shared_cache.py — 进程级共享缓存（按字节预算 LRU 淘汰；同一键并发未命中时只计算一次，其余线程等待并复用结果）
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Pending:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class SharedCache:
+    """多个 Streamlit 会话 / 导出线程共用的缓存。
+
+    - 每个值按 sizeof(value)（或 get_or_create 传入的 sizeof）计入 max_bytes，
+      超出预算或条目数超过 max_entries 时淘汰最久未用的条目（至少保留最新一条）；
+    - get_or_create(key, factory)：未命中时只有第一个线程执行 factory，同键的其余请求等待它的结果（计入 coalesced），
+      50 个会话同时刷新也只渲染一次；factory 抛出的异常同样交给等待者；
+    - clear() 用于数据变化时整体失效：进行中的计算结果仍返回给调用方，但不再写入缓存。
+    """
+
+    def __init__(self, max_bytes: int, max_entries: Optional[int] = None, sizeof: Callable[[object], int] = len):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.sizeof = sizeof
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, Tuple[object, int]]" = OrderedDict()
+        self._pending: Dict[Hashable, _Pending] = {}
+        self._generation = 0
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default=None):
+        """只查不算（不计入命中统计）"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            self._data.move_to_end(key)
+            return item[0]
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], object], sizeof: Optional[Callable[[object], int]] = None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = _Pending()
+                generation = self._generation
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not owner:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+        try:
+            pending.value = factory()
+            size = (sizeof or self.sizeof)(pending.value)
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._pending.get(key) is pending:
+                    del self._pending[key]
+                if pending.error is None and generation == self._generation:
+                    self._put(key, pending.value, size)
+            pending.done.set()
+        return pending.value
+
+    def _put(self, key: Hashable, value, size: int):
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.bytes -= old[1]
+        self._data[key] = (value, size)
+        self.bytes += size
+        while len(self._data) > 1 and (self.bytes > self.max_bytes or
+                                       (self.max_entries is not None and len(self._data) > self.max_entries)):
+            _, (_, evicted) = self._data.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._pending = {}
+            self._generation += 1
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._data), "bytes": self.bytes, "max_bytes": self.max_bytes, "hits": self.hits,
+                "misses": self.misses, "coalesced": self.coalesced, "evictions": self.evictions}
@@ -0,0 +1,94 @@
+# spirit_tags.py — 五老精神标签识别（关键词 + 同义词 + 权重，一次扫描匹配全部词条）
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Union
+
+# 同义词可写成列表（权重均为 1）或 {词: 权重}
+Synonyms = Mapping[str, Union[Sequence[str], Mapping[str, float]]]
+
+
+class SpiritTagger:
+    """把各精神的关键词与同义词编译成一个零宽前瞻的正则交替式，对每段生平只扫描一遍。
+
+    - 精神名本身是权重 1 的关键词；同义词按配置给权重；
+    - 一段文本中每个词条只计一次，某精神的得分为命中词条权重之和，达到 min_score 即打上该标签；
+    - 每个位置都尝试匹配，重叠的词条全部计入（如“首创新型”同时命中“首创”与“创新”）；
+      同一位置起始的词条中正则只返回最长的一个，其余（必为它的前缀）由预先算好的前缀表补上；
+    - 标签按得分降序、同分按配置顺序排列。
+    """
+
+    def __init__(self, spirits: Mapping[str, str], synonyms: Optional[Synonyms] = None, min_score: float = 1.0):
+        self.descriptions: Dict[str, str] = dict(spirits)
+        self.spirits: List[str] = list(spirits)
+        self.min_score = float(min_score)
+        self.terms: Dict[str, tuple] = {}   # 词条 -> (精神, 权重)
+        for spirit in self.spirits:
+            self.terms[spirit] = (spirit, 1.0)
+        for spirit, words in (synonyms or {}).items():
+            if spirit not in self.descriptions:
+                continue
+            items = words.items() if isinstance(words, Mapping) else ((w, 1.0) for w in words)
+            for word, weight in items:
+                if word and word not in self.terms:
+                    self.terms[word] = (spirit, float(weight))
+        ordered = sorted(self.terms, key=len, reverse=True)
+        # 前面的字符类只看首字，不可能命中的位置不必逐个尝试交替式
+        first_chars = "".join(sorted({t[0] for t in ordered}))
+        self._pattern = re.compile(f"(?=[{re.escape(first_chars)}])(?=({'|'.join(map(re.escape, ordered))}))") if ordered else None
+        # 词条 -> 自身及同为词条的前缀
+        self._prefixes: Dict[str, tuple] = {
+            term: tuple(term[:i] for i in range(1, len(term) + 1) if term[:i] in self.terms) for term in self.terms}
+        self._order = {s: i for i, s in enumerate(self.spirits)}
+        self.fingerprint = hashlib.sha1(json.dumps(
+            [self.spirits, sorted(self.terms.items()), self.min_score], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def from_config(cls, path: Path) -> "SpiritTagger":
+        """读取 config.json 的 wulao_spirit（精神 -> 说明）与 spirit_tagging（synonyms / min_score）"""
+        try:
+            cfg = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            cfg = {}
+        tagging = cfg.get("spirit_tagging", {})
+        return cls(cfg.get("wulao_spirit", {}), tagging.get("synonyms"), tagging.get("min_score", 1.0))
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """{精神: 得分}，只含命中的精神"""
+        out: Dict[str, float] = {}
+        if not text or self._pattern is None:
+            return out
+        hits = set()
+        for longest in set(self._pattern.findall(text)):
+            hits.update(self._prefixes[longest])
+        for term in hits:
+            spirit, weight = self.terms[term]
+            out[spirit] = out.get(spirit, 0.0) + weight
+        return out
+
+    def tag(self, text: str) -> List[str]:
+        scores = self.scores(text)
+        hit = [s for s, v in scores.items() if v >= self.min_score]
+        return sorted(hit, key=lambda s: (-scores[s], self._order[s]))
+
+    def tag_many(self, texts: Iterable[str]) -> List[List[str]]:
+        """批量打标签（加载数据时对全部生平调用一次），相同文本只匹配一次"""
+        memo: Dict[str, List[str]] = {}
+        out = []
+        for text in texts:
+            text = text or ""
+            tags = memo.get(text)
+            if tags is None:
+                tags = memo[text] = self.tag(text)
+            out.append(tags)
+        return out
+
+    def counts(self, tag_lists: Iterable[Sequence[str]]) -> Dict[str, int]:
+        """各精神的人数（按配置顺序，包含 0）"""
+        out = {s: 0 for s in self.spirits}
+        for tags in tag_lists:
+            for t in tags:
+                if t in out:
+                    out[t] += 1
+        return out
@@ -0,0 +1,271 @@
+# store.py — SQLite 存储后端（CSV 增量导入 / 导出，生平单独成表，按需读取）
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from genealogy import SPIRIT_TAGGER, parse_relations_with_report, safe_read_csv
+from profiling import PROFILER
+from spirit_tags import SpiritTagger
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# persons 表中单独成列的字段；CSV 里的其他列原样存进 extra（JSON），导出时还原
+PERSON_COLUMNS = ("avatar", "intro", "time", "is_wulao")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS persons (
+    name TEXT PRIMARY KEY,
+    avatar TEXT NOT NULL DEFAULT '',
+    intro TEXT NOT NULL DEFAULT '',
+    time TEXT NOT NULL DEFAULT '',
+    is_wulao TEXT NOT NULL DEFAULT '',
+    spirit_tags TEXT NOT NULL DEFAULT '',
+    extra TEXT NOT NULL DEFAULT '{}',
+    pos INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS person_bios (
+    name TEXT PRIMARY KEY,
+    bio TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS relations (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    relation TEXT NOT NULL DEFAULT '',
+    pos INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_persons_pos ON persons(pos);
+CREATE INDEX IF NOT EXISTS idx_relations_source ON relations(source);
+CREATE INDEX IF NOT EXISTS idx_relations_target ON relations(target);
+CREATE INDEX IF NOT EXISTS idx_relations_pos ON relations(pos);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class GenealogyStore:
+    """SQLite 存储。
+
+    - persons 只含名录与图谱常用的短字段（含预先算好的精神标签），生平 bio 放在 person_bios 表，
+      只有打开详情或生成图谱 HTML 时才按姓名读取；
+    - 姓名为主键，关系两端建索引；
+    - CSV 导入为增量：只对新增 / 变化 / 删除的行执行 INSERT / UPDATE / DELETE；
+    - 每张表有版本号（meta 表），有写入时递增，供 DataPipeline 作指纹；
+    - 建库时在 meta 中写入随机的 instance_id，删库重建后版本号从头计数也不会与旧库的指纹相同。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.execute("INSERT OR IGNORE INTO meta(key, value) VALUES('instance', ?)", (uuid.uuid4().hex,))
+        self._conn.commit()
+        self.instance_id = self._meta_get("instance")
+
+    # ---- meta ----
+    def _meta_get(self, key: str, default: str = "") -> str:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _meta_set(self, key: str, value: str):
+        self._conn.execute("INSERT INTO meta(key, value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                           (key, value))
+
+    def _bump(self, table: str):
+        self._meta_set(f"version:{table}", str(int(self._meta_get(f"version:{table}", "0")) + 1))
+
+    def version(self, table: str) -> int:
+        with self._lock:
+            return int(self._meta_get(f"version:{table}", "0"))
+
+    def get_meta(self, key: str, default: str = "") -> str:
+        with self._lock:
+            return self._meta_get(key, default)
+
+    def set_meta(self, key: str, value: str):
+        with self._lock, self._conn:
+            self._meta_set(key, value)
+
+    # ---- reads ----
+    @PROFILER.timed("store_persons")
+    def persons_frame(self) -> pd.DataFrame:
+        """名录 / 图谱所需的人物字段（不含 bio），按 CSV 原顺序"""
+        import pandas as pd
+        with self._lock:
+            df = pd.read_sql_query("SELECT name, avatar, intro, time, is_wulao, spirit_tags FROM persons ORDER BY pos, name",
+                                   self._conn)
+        return df.fillna("")
+
+    @PROFILER.timed("store_relations")
+    def triples(self) -> List[Tuple[str, str, str]]:
+        with self._lock:
+            return [tuple(r) for r in self._conn.execute("SELECT source, relation, target FROM relations ORDER BY pos, id")]
+
+    def bio(self, name: str) -> str:
+        with self._lock:
+            row = self._conn.execute("SELECT bio FROM person_bios WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else ""
+
+    @PROFILER.timed("store_bios")
+    def bios(self, names: Iterable[str]) -> Dict[str, str]:
+        names = list(names)
+        out: Dict[str, str] = {}
+        with self._lock:
+            # SQLite 默认最多 999 个参数，分批查询
+            for i in range(0, len(names), 500):
+                chunk = names[i:i + 500]
+                q = f"SELECT name, bio FROM person_bios WHERE name IN ({','.join('?' * len(chunk))})"
+                out.update(self._conn.execute(q, chunk).fetchall())
+        return out
+
+    def _write_person(self, name: str, record: Dict[str, str], pos: int, spirit_tags: str):
+        extra = {k: v for k, v in record.items() if k not in ("name", "bio") + PERSON_COLUMNS}
+        bio = record.get("bio", "") or ""
+        self._conn.execute(
+            "INSERT INTO persons(name, avatar, intro, time, is_wulao, spirit_tags, extra, pos) VALUES(?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET avatar = excluded.avatar, intro = excluded.intro, time = excluded.time, "
+            "is_wulao = excluded.is_wulao, spirit_tags = excluded.spirit_tags, extra = excluded.extra, pos = excluded.pos",
+            (name, *(str(record.get(c, "") or "") for c in PERSON_COLUMNS), spirit_tags,
+             json.dumps(extra, ensure_ascii=False), pos))
+        self._conn.execute("INSERT INTO person_bios(name, bio) VALUES(?, ?) ON CONFLICT(name) DO UPDATE SET bio = excluded.bio",
+                           (name, bio))
+
+    # ---- CSV import / export ----
+    def import_persons_csv(self, path: Path, tagger: Optional[SpiritTagger] = None) -> dict:
+        """把 persons.csv 增量同步进库，返回 {inserted, updated, moved, deleted}；只对新增 / 变化的行打精神标签，
+        内容未变、只是在 CSV 中换了位置的行只更新 pos（名录顺序与 CSV 后端一致）"""
+        tagger = tagger or SPIRIT_TAGGER
+        df = safe_read_csv(path)
+        incoming: Dict[str, Tuple[int, Dict[str, str]]] = {}
+        if not df.empty and "name" in df.columns:
+            for pos, rec in enumerate(df.to_dict("records")):
+                name = rec.get("name", "")
+                if name and name not in incoming:
+                    incoming[name] = (pos, {k: str(v) for k, v in rec.items()})
+        stats = {"inserted": 0, "updated": 0, "moved": 0, "deleted": 0}
+        with self._lock, self._conn:
+            existing = {}
+            for name, avatar, intro, time_, is_wulao, extra, bio, pos in self._conn.execute(
+                    "SELECT p.name, p.avatar, p.intro, p.time, p.is_wulao, p.extra, COALESCE(b.bio, ''), p.pos "
+                    "FROM persons p LEFT JOIN person_bios b ON b.name = p.name"):
+                existing[name] = ((avatar, intro, time_, is_wulao, extra, bio), pos)
+            changed = []
+            moved = []
+            for name, (pos, rec) in incoming.items():
+                extra = {k: v for k, v in rec.items() if k not in ("name", "bio") + PERSON_COLUMNS}
+                current = (*(rec.get(c, "") for c in PERSON_COLUMNS), json.dumps(extra, ensure_ascii=False), rec.get("bio", ""))
+                if name not in existing:
+                    changed.append((name, pos, rec))
+                    stats["inserted"] += 1
+                elif existing[name][0] != current:
+                    changed.append((name, pos, rec))
+                    stats["updated"] += 1
+                elif existing[name][1] != pos:
+                    moved.append((pos, name))
+            all_tags = tagger.tag_many(rec.get("bio", "") for _, _, rec in changed)
+            for (name, pos, rec), tags in zip(changed, all_tags):
+                self._write_person(name, rec, pos, ",".join(tags))
+            if moved:
+                self._conn.executemany("UPDATE persons SET pos = ? WHERE name = ?", moved)
+                stats["moved"] = len(moved)
+            removed = [(n,) for n in existing if n not in incoming]
+            if removed:
+                self._conn.executemany("DELETE FROM persons WHERE name = ?", removed)
+                self._conn.executemany("DELETE FROM person_bios WHERE name = ?", removed)
+                stats["deleted"] = len(removed)
+            if any(stats.values()):
+                self._bump("persons")
+            self._meta_set("persons_columns", json.dumps(list(df.columns), ensure_ascii=False))
+        return stats
+
+    def retag(self, tagger: SpiritTagger):
+        """标签配置（关键词 / 同义词 / 权重）变化后，按新配置给全部人物重新打标签"""
+        with self._lock, self._conn:
+            rows = self._conn.execute("SELECT name, bio FROM person_bios").fetchall()
+            all_tags = tagger.tag_many(bio for _, bio in rows)
+            self._conn.executemany("UPDATE persons SET spirit_tags = ? WHERE name = ?",
+                                   [(",".join(tags), name) for (name, _), tags in zip(rows, all_tags)])
+            self._meta_set("tagger", tagger.fingerprint)
+            self._bump("persons")
+
+    def import_relations_csv(self, path: Path) -> dict:
+        """把 relations.csv（两种格式均可）解析后增量同步进库，返回 {inserted, deleted, moved, report}；
+        保留下来的行按 CSV 中的新位置更新 pos"""
+        triples, report = parse_relations_with_report(safe_read_csv(path))
+        incoming = Counter((s, t, r) for s, r, t in triples)
+        first_pos: Dict[Tuple[str, str, str], int] = {}
+        for pos, (s, r, t) in enumerate(triples):
+            first_pos.setdefault((s, t, r), pos)
+        stats = {"inserted": 0, "deleted": 0, "moved": 0}
+        with self._lock, self._conn:
+            rows: Dict[Tuple[str, str, str], List[int]] = {}
+            row_pos: Dict[int, int] = {}
+            for rid, s, t, r, pos in self._conn.execute("SELECT id, source, target, relation, pos FROM relations ORDER BY id"):
+                rows.setdefault((s, t, r), []).append(rid)
+                row_pos[rid] = pos
+            to_delete = []
+            to_move = []
+            for key, ids in rows.items():
+                keep = incoming.get(key, 0)
+                if len(ids) > keep:
+                    to_delete.extend((rid,) for rid in ids[keep:])
+                to_move.extend((first_pos[key], rid) for rid in ids[:keep] if row_pos[rid] != first_pos[key])
+            to_insert = []
+            for key, count in incoming.items():
+                for _ in range(count - len(rows.get(key, ()))):
+                    to_insert.append((*key, first_pos[key]))
+            if to_delete:
+                self._conn.executemany("DELETE FROM relations WHERE id = ?", to_delete)
+            if to_insert:
+                self._conn.executemany("INSERT INTO relations(source, target, relation, pos) VALUES(?, ?, ?, ?)", to_insert)
+            if to_move:
+                self._conn.executemany("UPDATE relations SET pos = ? WHERE id = ?", to_move)
+            stats.update(inserted=len(to_insert), deleted=len(to_delete), moved=len(to_move))
+            if to_delete or to_insert or to_move:
+                self._bump("relations")
+            self._meta_set("relations_report", json.dumps(report, ensure_ascii=False))
+        stats["report"] = report
+        return stats
+
+    def relation_report(self) -> dict:
+        raw = self.get_meta("relations_report")
+        report = json.loads(raw) if raw else {"total": 0, "parsed": 0, "skipped": 0, "samples": []}
+        report["samples"] = [tuple(s) for s in report.get("samples", [])]
+        return report
+
+    def export_csv(self, persons_path: Path, relations_path: Path):
+        """导出为 CSV 供编辑：persons 按导入时的列顺序，relations 统一为 source,target,relation"""
+        import pandas as pd
+        with self._lock:
+            columns = json.loads(self._meta_get("persons_columns", "[]")) or ["name", "avatar", "intro", "bio", "time"]
+            records = []
+            for name, avatar, intro, time_, is_wulao, extra, bio in self._conn.execute(
+                    "SELECT p.name, p.avatar, p.intro, p.time, p.is_wulao, p.extra, COALESCE(b.bio, '') "
+                    "FROM persons p LEFT JOIN person_bios b ON b.name = p.name ORDER BY p.pos, p.name"):
+                rec = {"name": name, "avatar": avatar, "intro": intro, "time": time_, "is_wulao": is_wulao, "bio": bio}
+                rec.update(json.loads(extra))
+                records.append(rec)
+            rel_rows = self._conn.execute("SELECT source, target, relation FROM relations ORDER BY pos, id").fetchall()
+        persons = pd.DataFrame(records)
+        for c in persons.columns:
+            if c not in columns and not (c == "is_wulao" and not persons[c].astype(bool).any()):
+                columns.append(c)
+        persons = persons.reindex(columns=columns, fill_value="") if records else pd.DataFrame(columns=columns)
+        persons.to_csv(persons_path, index=False, encoding="utf-8-sig")
+        pd.DataFrame(rel_rows, columns=["source", "target", "relation"]).to_csv(relations_path, index=False, encoding="utf-8-sig")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()